@@ -0,0 +1,500 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks for router.py. Run from the command line, e.g.
+
+   python benchmark.py solvers
+   python benchmark.py startup
+   python benchmark.py suite --json bench_output.json
+   python benchmark.py rates
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import platform
+import argparse
+import subprocess
+import tracemalloc
+from math import factorial
+
+import router as prog
+
+# home airport first, then destinations; rows are cut from the front
+AIRPORTS = ['DUB', 'LHR', 'CDG', 'AMS', 'CPH', 'HEL', 'ARN', 'OSL', 'BRU', 'FRA',
+            'MAD', 'LIS', 'FCO', 'VIE', 'ZRH', 'PRG']
+
+def _time_solve(router, row, repeat):
+   """Loads row into router and returns the best of repeat wall times, in
+   seconds, for router.solve(), along with the route found.
+
+   Parameters
+   ----------
+   router: Router instance
+      The router to solve with, which determines the solver used.
+
+   row: list
+      A row as passed to Router.load_row.
+
+   repeat: int
+      The number of times to time the solve.
+   """
+   router.load_row(row)
+   best = float('inf')
+   for _ in range(repeat):
+      start = time.perf_counter()
+      route = router.solve()
+      best = min(best, time.perf_counter() - start)
+   return best, route
+
+def _describe(route):
+   """Returns the airport codes and cost of a route returned by Router.solve,
+   for comparing routes found by different Router instances.
+
+   Parameters
+   ----------
+   route: tuple
+      The home airport and journey, or None.
+   """
+   if route is None:
+      return None
+   return [airport._airport_code for airport in route[1][:-2]], route[1][-2]
+
+def bench_solvers(data, sizes, repeat):
+   """Compares permutation throughput of the per-journey loop against the
+   NumPy-vectorised solver, for rows of each number of airports in sizes.
+   Prints one line per row size.
+
+   Parameters
+   ----------
+   data: Data instance
+      Populated reference data.
+
+   sizes: list
+      Numbers of airports per row, including the home airport.
+
+   repeat: int
+      The number of times to time each solve.
+   """
+   if prog.np is None:
+      print("The Vectorised Solver Requires NumPy.\nQuitting")
+      sys.exit()
+
+   loop = prog.Router(data, 'permutations')
+   vectorised = prog.Router(data, 'vectorised')
+
+   print("{0:>8} {1:>10} {2:>14} {3:>14} {4:>8}".format(
+         'airports', 'routes', 'loop r/s', 'vector r/s', 'speedup'))
+
+   for size in sizes:
+      row = AIRPORTS[:size] + ['A320']
+      routes = factorial(size - 1)
+      loop_time, loop_route = _time_solve(loop, row, repeat)
+      vector_time, vector_route = _time_solve(vectorised, row, repeat)
+
+      if _describe(loop_route) != _describe(vector_route):
+         print("Solvers Disagree on {0}.\nQuitting".format(row))
+         sys.exit()
+
+      print("{0:>8} {1:>10} {2:>14.0f} {3:>14.0f} {4:>7.1f}x".format(
+            size, routes, routes / loop_time, routes / vector_time,
+            loop_time / vector_time))
+
+# run in a fresh interpreter, so that each measurement starts cold
+_STARTUP_SCRIPT = """
+import sys, json, time, tracemalloc
+import router
+try:
+   import resource
+except ImportError:
+   resource = None
+def max_rss():
+   if resource is None:
+      return None
+   rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+   return rss // 1024 if sys.platform == 'darwin' else rss
+def current_rss():
+   try:
+      with open('/proc/self/statm') as statm:
+         return int(statm.read().split()[1]) * resource.getpagesize() // 1024
+   except (OSError, AttributeError):
+      return None
+before = current_rss()
+start = time.perf_counter()
+data = router.Data(use_snapshot={0})
+data.populate_dicts()
+elapsed = time.perf_counter() - start
+after = current_rss()
+grown = None if before is None or after is None else after - before
+tracemalloc.start()
+data = router.Data(use_snapshot={0})
+data.populate_dicts()
+current, peak = tracemalloc.get_traced_memory()
+print(json.dumps([elapsed, current // 1024, peak // 1024, max_rss(), grown]))
+"""
+
+def bench_startup(repeat):
+   """Compares the time to populate a Data instance, and the memory it holds
+   and peaks at, as traced by tracemalloc, between reading airport.csv and
+   loading the snapshot. tracemalloc sees only Python's allocations, not the
+   pages of the memory-mapped snapshot, so the peak resident memory of the
+   process, from getrusage, is reported too, taken before tracing starts.
+   As importing the router sets most of that peak, the growth of resident
+   memory over the load itself is reported as well, where /proc gives it.
+   Either is blank where it cannot be read. Builds the snapshot first where
+   it is out of date. Prints one line per path.
+
+   Parameters
+   ----------
+   repeat: int
+      The number of fresh interpreters to time for each path.
+   """
+   data = prog.Data(use_snapshot=False)
+   data.populate_dicts()
+   if prog.Snapshot.load(data._snapshot_path, data._snapshot_sources()) is None:
+      data.write_snapshot()
+
+   print("{0:>10} {1:>12} {2:>12} {3:>12} {4:>12} {5:>12}".format(
+         'source', 'seconds', 'held KiB', 'peak KiB', 'max RSS KiB',
+         'load RSS KiB'))
+
+   for label, use_snapshot in [('csv', False), ('snapshot', True)]:
+      runs = []
+      for _ in range(repeat):
+         output = subprocess.run([sys.executable, '-c',
+                                  _STARTUP_SCRIPT.format(use_snapshot)],
+                                 cwd=os.path.dirname(os.path.abspath(prog.__file__)),
+                                 capture_output=True, text=True, check=True)
+         runs.append(json.loads(output.stdout.splitlines()[-1]))
+      max_rss = [run[3] for run in runs if run[3] is not None]
+      load_rss = [run[4] for run in runs if run[4] is not None]
+      print("{0:>10} {1:>12.4f} {2:>12} {3:>12} {4:>12} {5:>12}".format(
+            label, min(run[0] for run in runs), runs[0][1], runs[0][2],
+            min(max_rss) if max_rss else '', min(load_rss) if load_rss else ''))
+
+def synthetic_rows(data, sizes, rows, seed, aircraft):
+   """Returns, for each size, a list of rows of that many distinct airports,
+   drawn from the airports of airport.csv that can be resolved, each followed
+   by the aircraft code. Drawn with a generator seeded with seed, so that the
+   same arguments give the same rows.
+
+   Parameters
+   ----------
+   data: Data instance
+      Populated reference data.
+
+   sizes: list
+      Numbers of airports per row, including the home airport.
+
+   rows: int
+      The number of rows of each size.
+
+   seed: int
+      The seed of the random number generator.
+
+   aircraft: string
+      The aircraft code ending every row.
+   """
+   generator = random.Random(seed)
+   codes = sorted(data._resolved_airports)
+   return {size: [generator.sample(codes, size) + [aircraft]
+                  for _ in range(rows)]
+           for size in sizes}
+
+def write_rows(directory, routes):
+   """Writes each size's rows to routes_<size>.csv in directory, in the layout
+   of test.csv, so that a run can be reproduced or inspected.
+
+   Parameters
+   ----------
+   directory: string
+      The directory to write to, which is created where missing.
+
+   routes: dict
+      Size -> list of rows, as returned by synthetic_rows.
+   """
+   os.makedirs(directory, exist_ok=True)
+   for size, rows in routes.items():
+      with open(os.path.join(directory, 'routes_{0}.csv'.format(size)), 'w',
+                newline='') as file:
+         writer = csv.writer(file)
+         writer.writerow(['a{0}'.format(i + 1) for i in range(size)] + ['code'])
+         writer.writerows(rows)
+
+def _measure(stage, size, items, function):
+   """Runs function twice, first timed, then with tracemalloc tracing, so that
+   tracing does not inflate the time, and returns the measurements of the
+   stage as a dict.
+
+   Parameters
+   ----------
+   stage: string
+      The name of the stage measured.
+
+   size: int
+      The number of airports per row, or None where not applicable.
+
+   items: int
+      The number of items, e.g. rows or airports, the stage processes.
+
+   function: callable
+      Runs the stage once, taking no arguments.
+   """
+   start = time.perf_counter()
+   function()
+   seconds = time.perf_counter() - start
+
+   tracemalloc.start()
+   function()
+   peak = tracemalloc.get_traced_memory()[1]
+   tracemalloc.stop()
+
+   return {'stage': stage,
+           'size': size,
+           'items': items,
+           'seconds': seconds,
+           'items_per_second': items / seconds if seconds else None,
+           'peak_kib': peak // 1024}
+
+def bench_suite(sizes, rows, seed, solver, aircraft, routes_dir=None):
+   """Measures each stage of a run, for seeded synthetic rows of each size:
+   loading the csv files into Data, resolving each row's airports into
+   Airport instances, loading each row into a Router, and solving each row.
+   Returns a list of measurements, one per stage and size, as returned by
+   _measure.
+
+   Parameters
+   ----------
+   sizes: list
+      Numbers of airports per row, including the home airport.
+
+   rows: int
+      The number of rows of each size.
+
+   seed: int
+      The seed from which the rows are drawn.
+
+   solver: string
+      The solver to solve rows with, one of Router._solvers.
+
+   aircraft: string
+      The aircraft code of every row. A long range aircraft keeps rows
+      feasible, so that solvers are measured doing their full work.
+
+   routes_dir: string
+      Directory to which the rows are written, or None.
+   """
+   def load_data():
+      data = prog.Data(use_snapshot=False)
+      data.populate_dicts()
+      return data
+
+   results = [_measure('data_load', None, 1, load_data)]
+
+   data = load_data()
+   routes = synthetic_rows(data, sizes, rows, seed, aircraft)
+   if routes_dir is not None:
+      write_rows(routes_dir, routes)
+
+   for size in sizes:
+      codes = [code for row in routes[size] for code in row[:-1]]
+
+      def resolve():
+         for code in codes:
+            prog.Airport(data, code)
+
+      def load():
+         router = prog.Router(data, solver)
+         for row in routes[size]:
+            router.load_row(row)
+
+      def solve():
+         router = prog.Router(data, solver)
+         for row in routes[size]:
+            router.load_row(row)
+            router.solve()
+
+      results.append(_measure('airport_resolution', size, len(codes), resolve))
+      results.append(_measure('load_row', size, rows, load))
+      results.append(_measure('solve', size, rows, solve))
+
+   return results
+
+def compare(results, previous_path):
+   """Prints, for each stage and size measured in both, the ratio of the time
+   taken now to that of a previous run saved with --json; above 1 is slower.
+
+   Parameters
+   ----------
+   results: list
+      Measurements, as returned by bench_suite.
+
+   previous_path: string
+      The JSON file of the previous run.
+   """
+   with open(previous_path) as file:
+      previous = {(result['stage'], result['size']): result
+                  for result in json.load(file)['results']}
+
+   print("\n{0:>20} {1:>6} {2:>12} {3:>12} {4:>8}".format(
+         'stage', 'size', 'previous s', 'current s', 'ratio'))
+   for result in results:
+      before = previous.get((result['stage'], result['size']))
+      if before is None or not before['seconds']:
+         continue
+      print("{0:>20} {1:>6} {2:>12.4f} {3:>12.4f} {4:>8.2f}".format(
+            result['stage'], result['size'] or '', before['seconds'],
+            result['seconds'], result['seconds'] / before['seconds']))
+
+def bench_rates(sizes, rows, seed, aircraft, currencies):
+   """Compares solving rows again after a change of currency rates, cold,
+   from freshly loaded data with no cache, against incrementally, applying
+   the change to the loaded data and solving from the routes cached before
+   it. Rows are drawn as by synthetic_rows; the rates of currencies drawn
+   from those of the rows' airports change by up to a quarter. Prints one line
+   per row size, and quits where the two disagree on any cost.
+
+   Parameters
+   ----------
+   sizes: list
+      Numbers of airports per row, including the home airport.
+
+   rows: int
+      The number of rows of each size.
+
+   seed: int
+      The seed from which the rows and changes are drawn.
+
+   aircraft: string
+      The aircraft code of every row.
+
+   currencies: int
+      The number of currencies whose rates change.
+   """
+   data = prog.Data(use_snapshot=False)
+   data.populate_dicts()
+   routes = synthetic_rows(data, sizes, rows, seed, aircraft)
+
+   generator = random.Random(seed)
+   used = sorted({data._resolved_airports[code]._currency
+                  for size in sizes for row in routes[size] for code in row[:-1]})
+   changes = {currency: data._rate_index[currency] * generator.uniform(0.75, 1.25)
+              for currency in generator.sample(used, min(currencies, len(used)))}
+
+   cache = prog.RouteCache(capacity=len(sizes) * rows)
+   router = prog.Router(data, cache=cache)
+   for size in sizes:
+      for row in routes[size]:
+         router.load_row(row)
+         router.solve()
+
+   start = time.perf_counter()
+   router.update_rates(data.update_rates(changes))
+   update_time = time.perf_counter() - start
+
+   start = time.perf_counter()
+   cold_data = prog.Data(use_snapshot=False)
+   cold_data.populate_dicts()
+   cold_data.update_rates(changes)
+   load_time = time.perf_counter() - start
+   cold = prog.Router(cold_data)
+
+   print("{0} currencies changed; update {1:.4f} s, cold load {2:.4f} s\n".format(
+         len(changes), update_time, load_time))
+   print("{0:>8} {1:>6} {2:>12} {3:>12} {4:>8}".format(
+         'airports', 'rows', 'cold s', 'warm s', 'speedup'))
+
+   for size in sizes:
+      warm_time = cold_time = 0.0
+      for row in routes[size]:
+         warm_seconds, warm_route = _time_solve(router, row, 1)
+         cold_seconds, cold_route = _time_solve(cold, row, 1)
+         warm_time += warm_seconds
+         cold_time += cold_seconds
+
+         if (warm_route and warm_route[1][-2]) != (cold_route and cold_route[1][-2]):
+            print("Warm and Cold Costs Disagree on {0}.\nQuitting".format(row))
+            sys.exit()
+
+      print("{0:>8} {1:>6} {2:>12.4f} {3:>12.4f} {4:>7.1f}x".format(
+            size, rows, cold_time, warm_time, cold_time / warm_time))
+
+def main():
+   """Driver function. Loads the reference data once and runs the chosen
+   benchmark.
+   """
+   parser = argparse.ArgumentParser(description="Benchmarks for router.py.")
+   parser.add_argument('benchmark', choices=['solvers', 'startup', 'suite', 'rates'])
+   parser.add_argument('--sizes', type=int, nargs='+',
+                       help="airports per row, including the home airport; "
+                       "5 8 10 for solvers, 5 8 10 12 15 for suite, 6 8 10 "
+                       "12 for rates")
+   parser.add_argument('--repeat', type=int, default=3,
+                       help="times to run each measurement, keeping the best")
+   parser.add_argument('--rows', type=int, default=3,
+                       help="suite, rates: synthetic rows of each size")
+   parser.add_argument('--seed', type=int, default=2019,
+                       help="suite, rates: seed of the synthetic rows")
+   parser.add_argument('--solver', choices=prog.Router._solvers, default='auto',
+                       help="suite: solver to solve rows with")
+   parser.add_argument('--aircraft', default='MD11',
+                       help="suite, rates: aircraft code of the synthetic rows")
+   parser.add_argument('--currencies', type=int, default=3,
+                       help="rates: number of currencies whose rates change")
+   parser.add_argument('--routes-dir',
+                       help="suite: directory to write the synthetic rows to")
+   parser.add_argument('--json',
+                       help="suite: file to write the results to")
+   parser.add_argument('--compare',
+                       help="suite: results file of a previous run to compare "
+                       "times against")
+   args = parser.parse_args()
+
+   if args.benchmark == 'startup':
+      bench_startup(args.repeat)
+      return
+
+   if args.benchmark == 'rates':
+      bench_rates(args.sizes or [6, 8, 10, 12], args.rows, args.seed,
+                  args.aircraft, args.currencies)
+      return
+
+   if args.benchmark == 'suite':
+      sizes = args.sizes or [5, 8, 10, 12, 15]
+      results = bench_suite(sizes, args.rows, args.seed, args.solver,
+                            args.aircraft, args.routes_dir)
+
+      print("{0:>20} {1:>6} {2:>8} {3:>10} {4:>14} {5:>10}".format(
+            'stage', 'size', 'items', 'seconds', 'items/s', 'peak KiB'))
+      for result in results:
+         print("{0:>20} {1:>6} {2:>8} {3:>10.4f} {4:>14.1f} {5:>10}".format(
+               result['stage'], result['size'] or '', result['items'],
+               result['seconds'], result['items_per_second'] or 0,
+               result['peak_kib']))
+
+      if args.json:
+         with open(args.json, 'w') as file:
+            json.dump({'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'seed': args.seed,
+                       'rows': args.rows,
+                       'solver': args.solver,
+                       'aircraft': args.aircraft,
+                       'sizes': sizes,
+                       'results': results}, file, indent=1)
+
+      if args.compare:
+         compare(results, args.compare)
+      return
+
+   data = prog.Data()
+   data.populate_dicts()
+
+   if args.benchmark == 'solvers':
+      bench_solvers(data, args.sizes or [5, 8, 10], args.repeat)
+
+if __name__ == "__main__":
+   main()
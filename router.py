@@ -9,520 +9,4239 @@ import os
 import sys
 import csv
 import glob
-from itertools import permutations
-from math import sin, cos, radians, asin, sqrt
+import json
+import time
+import mmap
+import heapq
+import bisect
+import struct
+import random
+import hashlib
+import argparse
+from array import array
+from collections import OrderedDict
+import multiprocessing
+from itertools import permutations, islice
+from operator import itemgetter
+from math import sin, cos, radians, asin, sqrt, factorial, pi
+
+try:
+   import numpy as np
+except ImportError: # optional; only the 'vectorised' solver requires it
+   np = None
+
+class AirportRecord:
+   """A class holding the fields of one airport that the router uses, joined
+   across airport.csv, countrycurrency.csv, and currencyrates.csv, and
+   converted once to native types. Slotted, so that a record costs a few
+   references rather than a dict of every csv column.
+
+   Attributes
+   ----------
+   _name: string
+      The airport's name.
+
+   _latitude: float
+      The latitudinal coordinates of the airport.
+
+   _longitude: float
+      The longitudinal coordinates of the airport.
+
+   _country: string
+      The country in which the airport exists.
+
+   _currency: string
+      The alphabetic code of the currency used in that country.
+
+   _to_euro_rate: float
+      The exchange rate from that currency to Euro.
+   """
+
+   __slots__ = ('_name', '_latitude', '_longitude', '_country', '_currency',
+                '_to_euro_rate')
+
+   def __init__(self, name, latitude, longitude, country, currency, to_euro_rate):
+      self._name = name
+      self._latitude = latitude
+      self._longitude = longitude
+      self._country = country
+      self._currency = currency
+      self._to_euro_rate = to_euro_rate
+
+   def _fields(self):
+      return (self._name, self._latitude, self._longitude, self._country,
+              self._currency, self._to_euro_rate)
+
+   def __eq__(self, other):
+      return isinstance(other, AirportRecord) and self._fields() == other._fields()
+
+   def __repr__(self):
+      return 'AirportRecord{0}'.format(self._fields())
 
 class Data:
    """A class that collects, internally organises, and reads into dictionaries
-   inputs csv files, excepting the test.csv, given a hard-coded path. Dicts
-   are used by other classes and the program's main method. 
+   inputs csv files, excepting the test.csv, from a data directory, by default
+   the hard-coded path. Only the columns the router uses are kept, converted
+   once to native types. Dicts are used by other classes and the program's
+   main method.
 
    Attributes
    ----------
+   _data_dir: string
+      The directory from which the csv files are read.
+
    _input_csvs: list
-      A list of full filepaths for each of the 5 inputs CSV files (inc. 'test')
+      A list of full filepaths for each of the 5 inputs CSV files (inc. 'test'),
+      in the order of _input_names.
 
    _input_test: string
-      The full filepath to the test file.
+      The full filepath to the test file, or '' where the data directory has
+      none, as the server does not need one.
 
-   _aircraft_dict: dict
-      Dictionary representation of data in aircraft.csv. Dict keys are ascending
-      integers, beginning at 0.
+   _currency_index: dict
+      Upper-cased country name -> currency alphabetic code, from
+      countrycurrency.csv.
 
-   _airport_dict: dict
-      Dictionary representation of data in airport.csv. Dict keys are ascending
-      integers, beginning at 0.
+   _rate_index: dict
+      Currency code -> exchange rate to Euro, as a float, from
+      currencyrates.csv.
+
+   _aircraft_index: dict
+      Aircraft code -> range normalised to km, from aircraft.csv.
+
+   _rates_version: string
+      A digest of the contents of currencyrates.csv, which changes whenever the
+      rates do; part of the key of cached routes.
+
+   _resolved_airports: dict
+      Airport code -> AirportRecord, joined across the three airport-related
+      files. Airports whose currency or rate cannot be found are omitted.
+      Where an up to date snapshot is loaded, a Snapshot instance, which is
+      looked up the same way.
+
+   _use_snapshot: bool
+      Whether populate_dicts loads the snapshot in place of airport.csv, where
+      the snapshot is up to date.
+
+   _snapshot_path: string
+      The full filepath of the snapshot, alongside the input csv files.
+
+   _spatial_index: SpatialIndex instance
+      Index by position of every airport of airport.csv, including those
+      omitted from _resolved_airports, built on first use by spatial_index,
+      or None until then.
 
-   _countrycurrency_dict: dict
-      Dictionary representation of data in countrycurrency.csv. Dict keys are
-      ascending integers, beginning at 0.
+   _resolved_index: SpatialIndex instance
+      Index by position of the resolved airports only, those with a known
+      rate, for refuelling stops; likewise built on first use, or None.
 
-   _currency_rates_dict: dict
-      Dictionary representation of data in currencyrates.csv. Dict keys are
-      ascending integers, beginning at 0.
+   _distances_path: string
+      The full filepath of the distance store, alongside the input csv files.
 
-   _output_dicts: list
-      A list that collects the preceding 4 dictionary objects.
+   _distance_store: DistanceStore instance
+      The precomputed distance of every pair of airports, from which routers
+      read distances once opened by distance_store, or None until then.
 
    Methods
    -------
-   _collect_datasets
-      Static method that returns the absolute path for each .csv file in the
-      target directory, hard-coded and specified in the csv_repo variable.
+   _collect_datasets(csv_repo)
+      Static method that returns the absolute path for each of the input csv
+      files named in _input_names, in the target directory, by default the
+      hard-coded _default_dir.
+
+   _read_columns(path, columns)
+      Static method that yields the named columns of each row of a csv file.
+
+   _read_coordinates(path)
+      Static method that returns the position of every airport of airport.csv.
 
    populate_dicts
-      Method employs CSV module's DictReader to read all .csv files, excluding
-      test.csv, listed in the _input_csvs attribute and write them in dict 
-      form to the four data dictionaries listed in the _output_dicts attribute.
-      Hard-coded range (0,4) loop, as always only 4 input files.
+      Method that reads the 4 informational / non-test csv files listed in the
+      _input_csvs attribute into the dictionaries above, keeping only the
+      columns used and converting them to native types.
+
+   _snapshot_sources
+      Returns the filepaths of the 3 csv files from which the snapshot is
+      built.
+
+   update_rates(rates, version)
+      Applies changed exchange rates to the affected airport records in
+      place, returning the currencies changed.
+
+   reload_rates
+      Reads currencyrates.csv again and applies the rates that changed.
+
+   write_snapshot
+      Writes the resolved airport records to the snapshot file. Requires the
+      dicts to have been populated from the csv files.
+
+   spatial_index(resolved)
+      Returns the SpatialIndex of every airport of airport.csv, or of the
+      resolved airports only, building each once.
+
+   distance_store
+      Opens the DistanceStore of every pair of airports, first regenerating it
+      where airport.csv has changed.
+
+   reachable_airports(code, radius)
+      Returns every airport within radius km of the airport with code.
    """
 
-   def __init__(self):
-      self._input_csvs = Data._collect_datasets()
+   _default_dir = \
+   "/Users/davidodwyer/Documents/ComputerScience/Independent/scripts/python-scripts/university_projects/aeroplane_routing"
+
+   # the input csv files, by name, in the order populate_dicts reads them;
+   # test.csv, last, may be missing, as the server does not need it
+   _input_names = ('aircraft.csv', 'airport.csv', 'countrycurrency.csv',
+                   'currencyrates.csv', 'test.csv')
+
+   def __init__(self, use_snapshot=True, data_dir=None):
+      self._data_dir = data_dir or Data._default_dir
+      self._input_csvs = Data._collect_datasets(self._data_dir)
       self._input_test = ''.join([item for item in self._input_csvs if \
                            os.path.basename(item) == 'test.csv'])
-      self._input_csvs.remove(self._input_test)
+      if self._input_test:
+         self._input_csvs.remove(self._input_test)
 
-      self._aircraft_dict = dict()
-      self._airport_dict = dict()
-      self._countrycurrency_dict = dict()
-      self._currency_rates_dict = dict()
+      self._currency_index = dict()
+      self._rate_index = dict()
+      self._aircraft_index = dict()
+      self._resolved_airports = dict()
+      self._rates_version = ''
+
+      self._spatial_index = None
+      self._resolved_index = None
+
+      self._use_snapshot = use_snapshot
+      self._snapshot_path = os.path.join(self._data_dir, 'airports.snapshot')
 
-      self._output_dicts = [self._aircraft_dict,
-                           self._airport_dict,
-                           self._countrycurrency_dict,
-                           self._currency_rates_dict]
+      self._distance_store = None
+      self._distances_path = os.path.join(self._data_dir, 'airports.distances')
 
-   def _collect_datasets():
-      """Returns the absolute path for each .csv path in the hard-coded path.
+   def _collect_datasets(csv_repo=None):
+      """Returns the absolute path for each of the input csv files named in
+      _input_names, in the given directory, by default the hard-coded path.
+      Files are selected by name, not by position among the directory's csv
+      files, so that other csv files in it are ignored. Paths are in the
+      order of _input_names, as populate_dicts relies on; test.csv is left
+      out where missing, but any other file missing quits.
+
+      Parameters
+      ----------
+      csv_repo: string
+         The directory holding the csv files, or None for _default_dir.
       """
-      csv_repo = \
-      "/Users/davidodwyer/Documents/ComputerScience/Independent/scripts/python-scripts/university_projects/aeroplane_routing" 
+      csv_repo = csv_repo or Data._default_dir
 
       try:
-         filepaths = [os.path.abspath(f) for f in os.listdir(path=csv_repo)\
-            if '.csv' in os.path.basename(f)]
+         present = set(os.listdir(path=csv_repo))
+         if not all(name in present for name in Data._input_names[:-1]):
+            raise OSError("input csv file missing")
+         filepaths = [os.path.abspath(os.path.join(csv_repo, name))
+                      for name in Data._input_names if name in present]
          return filepaths
       except:
          print("Dataset Collection Failed.\nQuitting")
          sys.exit()
 
+   def _read_columns(path, columns):
+      """Yields, for each row of a csv file, a list of the values in the named
+      columns only, in the order named. Columns are located once from the
+      header row, rather than building a dict of every column per row.
+
+      Parameters
+      ----------
+      path: string
+         The full filepath of the csv file.
+
+      columns: list
+         The names of the columns to read, as given in the header row.
+      """
+      with open(path, newline='') as csv_file:
+         csv_reader = csv.reader(csv_file)
+         header = next(csv_reader)
+         positions = [header.index(column) for column in columns]
+         for row in csv_reader:
+            yield [row[i] for i in positions]
+
+   def _read_coordinates(path):
+      """Returns a dict of airport code -> (latitude, longitude), as floats,
+      of every airport of airport.csv, whether or not its currency and rate
+      resolve. First match wins on duplicate codes.
+
+      Parameters
+      ----------
+      path: string
+         The full filepath of airport.csv.
+      """
+      coordinates = dict()
+      for code, latitude, longitude in Data._read_columns(path,
+            ['airport_code', 'latitude', 'longitude']):
+         if code not in coordinates:
+            coordinates[code] = (float(latitude), float(longitude))
+      return coordinates
+
    def populate_dicts(self):
-      """Opens, reads, and writes to prior initialised dictionaries, positionally
-      ordered in the _output_dicts, the 4 informational / non-test csv files. 
-      Hard-coded loop, as always only 4 such files.
+      """Reads the 4 informational / non-test csv files, positionally ordered in
+      the _input_csvs, into the prior initialised dictionaries, keeping only
+      the columns used and converting numbers to floats once. Aircraft ranges
+      are normalised to km. airport.csv is read last, so that each airport is
+      joined with its currency and rate as it is read. First match wins on
+      duplicate keys. Where the snapshot is in use and up to date, airport.csv
+      is not read, and the resolved airport records are taken from the
+      snapshot instead.
       """
-      try:
-         iteration = 0 # outer iteration indexes a dict from _output dicts 
-         while iteration < 4:
-            with open(self._input_csvs[iteration], newline='') as csv_file:
-               csv_reader = csv.DictReader(csv_file)
+      snapshot = None
+      if self._use_snapshot:
+         snapshot = Snapshot.load(self._snapshot_path, self._snapshot_sources())
 
-               i=0 # incrememting variables used to set dict key for each row
-               for row in csv_reader:
-                  self._output_dicts[iteration][i] = dict(row)
-                  i+=1
+      aircraft_csv, airport_csv, countrycurrency_csv, currency_rates_csv = \
+         self._input_csvs[0:4]
 
-            iteration+=1
+      try:
+         for code, units, aircraft_range in Data._read_columns(aircraft_csv,
+               ['code', 'units', 'range']):
+            aircraft_range = float(aircraft_range)
+            if units.lower().strip() == 'imperial':
+               aircraft_range = aircraft_range * 1.60934
+            self._aircraft_index.setdefault(code, aircraft_range)
 
-      except:
-         print("Reading CSVs Failed.\nQuitting")
-         sys.exit()
+         for country, currency in Data._read_columns(countrycurrency_csv,
+               ['currency_country_name', 'currency_alphabetic_code']):
+            self._currency_index.setdefault(country, currency)
 
-class Aircraft:
-   """A class that takes an identifying aircraft code and collects data regarding
-   that aircraft, specifically its range, which is normalised to metric units.
+         for currency, rate in Data._read_columns(currency_rates_csv,
+               ['CurrencyCode', 'toEuro']):
+            self._rate_index.setdefault(currency, float(rate))
 
-   Attributes
-   ----------
-   _aircraft_code: string
-      A string which identifies a particular aircraft, for which there is
-      information on in the Data instance's _aircraft_dict.
+         with open(currency_rates_csv, 'rb') as rates_file:
+            self._rates_version = hashlib.sha1(rates_file.read()).hexdigest()
 
-   _data: Data class instance
-      Instance of the Data class passed from an instance of the Router class.
-      Contains the dictionaries representing the input csv data.
+         if snapshot is not None:
+            self._resolved_airports = snapshot
+            return
 
-   _range: float
-      Number representing the maximum range of the aircraft.
+         seen = set()
+         for code, name, latitude, longitude, country in Data._read_columns(
+               airport_csv, ['airport_code', 'airport_name', 'latitude',
+                             'longitude', 'country']):
+            if code in seen:
+               continue
+            seen.add(code)
 
-   Methods
-   -------
-   _lookup_range(code):
-      A method that takes the aircraft code, performs a lookup in _data for
-      that aircraft's range and metric (imperial / metric), and converts range
-      to metric if given as imperial.
-   """
+            currency = self._currency_index.get(country.upper())
+            if currency not in self._rate_index:
+               continue
+            self._resolved_airports[code] = AirportRecord(name,
+                                                          float(latitude),
+                                                          float(longitude),
+                                                          country,
+                                                          currency,
+                                                          self._rate_index[currency])
 
-   def __init__(self, data_store, aircraft_code):
-      self._aircraft_code = aircraft_code
-      self._data = data_store
-      self._range = self._lookup_range(self._aircraft_code)
+      except (OSError, ValueError, IndexError):
+         print("Reading CSVs Failed.\nQuitting")
+         sys.exit()
 
-   def _lookup_range(self, code):
-      """ Sets aircraft's _range attribute with normalised range (km), which is 
-      looked up in the _aircraft_dict. Finds key where code == code; uses key 
-      to access that entry's range value. Called from Class' init method.
+   def update_rates(self, rates, version=None):
+      """Applies changed exchange rates to Euro in place, without reading the
+      csv files again. Only airports paid for in a changed currency have their
+      record updated; as Airport instances are views onto the records, they
+      see the new rates at once. A snapshot in use is first copied into a dict
+      of its records, as the snapshot file is read-only; records already
+      looked up are kept, not copied, so that Airport instances of them see
+      the new rates too. Airports omitted for lack of a rate at load stay
+      omitted. Returns the set of currency codes whose rate changed.
 
       Parameters
       ----------
-      code: string
-         Identifying aircraft code, which is first passed to the init method.
+      rates: dict
+         Currency code -> new exchange rate to Euro.
+
+      version: string
+         The new _rates_version, or None to derive one from the old version
+         and the changes.
       """
-      try:
-         for key in self._data._aircraft_dict:
-            if self._data._aircraft_dict[key]['code'] == code:
-               self._found_range = float(self._data._aircraft_dict[key]['range'])
-               self._metric = self._data._aircraft_dict[key]['units']
-               if self._metric.lower().strip() == 'imperial':
-                  self._found_range =  self._found_range * 1.60934
-               
-               return self._found_range
-      except KeyError:
-         print("An Aircraft Code Was Not Found.\nQuitting")
-         sys.exit()
+      changed = {currency for currency, rate in rates.items()
+                 if self._rate_index.get(currency) != float(rate)}
+      if not changed:
+         return changed
 
-class Airport:
-   """A class that takes an identifying airport code and collects data regarding
-   that airport.
+      for currency in changed:
+         self._rate_index[currency] = float(rates[currency])
 
-   Attributes
-   ----------
-   _airport_code: string:
-      A string which identifies a particular airport, for which there is
-      information on in the Data instance's _aircraft_dict.
+      if isinstance(self._resolved_airports, Snapshot):
+         self._resolved_airports = dict(self._resolved_airports.items())
+      for record in self._resolved_airports.values():
+         if record._currency in changed:
+            record._to_euro_rate = self._rate_index[record._currency]
 
-   _data: Data class instance
-      Instance of the Data class passed from an instance of the Router class.
-      Contains the dictionaries representing the input csv data.
+      if version is None:
+         delta = ''.join('{0}={1!r};'.format(currency, self._rate_index[currency])
+                         for currency in sorted(changed))
+         version = hashlib.sha1((self._rates_version + delta).encode()).hexdigest()
+      self._rates_version = version
+      return changed
 
-   _airport_name: string
-      A string representation of the airport's name.
+   def reload_rates(self):
+      """Reads currencyrates.csv again, e.g. after its daily update, and
+      applies the rates that changed through update_rates. The new
+      _rates_version is the digest of the file, as populate_dicts would give.
+      Returns the set of currency codes whose rate changed.
+      """
+      currency_rates_csv = self._input_csvs[3]
+      rates = dict()
+      try:
+         for currency, rate in Data._read_columns(currency_rates_csv,
+               ['CurrencyCode', 'toEuro']):
+            rates.setdefault(currency, float(rate))
+         with open(currency_rates_csv, 'rb') as rates_file:
+            version = hashlib.sha1(rates_file.read()).hexdigest()
+      except (OSError, ValueError, IndexError):
+         print("Reading CSVs Failed.\nQuitting")
+         sys.exit()
 
-   _latitude: float
-      The latitudinal coordinates of the airport.
+      changed = self.update_rates(rates, version)
+      # as populate_dicts would give, even where no rate changed
+      self._rates_version = version
+      return changed
 
-   _longitude: float
-      The longitudinal coordinates of the airport.
+   def _snapshot_sources(self):
+      """Returns the filepaths of airport.csv, countrycurrency.csv, and
+      currencyrates.csv, positionally ordered in the _input_csvs, from which
+      the snapshot's records are joined.
+      """
+      return self._input_csvs[1:4]
 
-   _country: string
-      A string representation of the country in which the airport exists.
+   def write_snapshot(self):
+      """Writes the resolved airport records to the snapshot file, stamped with
+      the size and modification time of each of its source csv files. Must
+      follow populate_dicts having read airport.csv, i.e. with the snapshot
+      not in use or out of date.
+      """
+      if isinstance(self._resolved_airports, Snapshot):
+         print("Snapshot Is Already Up To Date.")
+         return
 
-   _currency: string
-      A string representation of the currency alphabetic code, identifying the
-      currency used in the country in which the airport is.
+      try:
+         Snapshot.write(self._snapshot_path, self._resolved_airports,
+                        self._snapshot_sources())
+      except OSError:
+         print("Writing Snapshot Failed.\nQuitting")
+         sys.exit()
 
-   _to_euro_rate: float
-      The exchange rate from the currency used in country in which the airport
-      is to Euro.
+   def spatial_index(self, resolved=False):
+      """Returns the SpatialIndex of every airport of airport.csv, building it
+      on the first call only, as most runs make no positional queries. Read
+      from airport.csv rather than the resolved airports, so that airports
+      whose currency or rate is not known are found too. Where resolved, the
+      index of the resolved airports only is returned instead, e.g. for
+      refuelling stops, where fuel must be costed at a known rate.
 
-   Methods
-   -------
-   _populate_fields(code)
-      A method that takes an airport's identifying code, iterates through 3 of
-      the data sources, and returns all of the instance's attribute data, other
-      than the airport code and data source, with which it is initialised.
-   """
+      Parameters
+      ----------
+      resolved: bool
+         Whether to index only the airports of _resolved_airports.
+      """
+      if resolved:
+         if self._resolved_index is None:
+            self._resolved_index = SpatialIndex(
+               {code: (record._latitude, record._longitude)
+                for code, record in self._resolved_airports.items()})
+         return self._resolved_index
 
-   def __init__(self, data_store, airport_code):
-      self._airport_code = airport_code
-      self._data = data_store
+      if self._spatial_index is None:
+         try:
+            coordinates = Data._read_coordinates(self._input_csvs[1])
+         except (OSError, ValueError, IndexError):
+            print("Reading CSVs Failed.\nQuitting")
+            sys.exit()
+         self._spatial_index = SpatialIndex(coordinates)
+      return self._spatial_index
 
-      try:
-         self._airport_name,\
-         self._latitude,\
-         self._longitude,\
-         self._country,\
-         self._currency,\
-         self._to_euro_rate = self._populate_fields(self._airport_code)
+   def distance_store(self):
+      """Opens the DistanceStore of every pair of airports in airport.csv, so
+      that routers read distances from it in place of calculating them, and
+      returns it. The store file is regenerated first where it is missing or
+      out of date with airport.csv, and is otherwise reused across runs.
+      """
+      if self._distance_store is not None:
+         return self._distance_store
 
-      except:
-         print("An Airport not found.\nQuitting")
+      airport_csv = self._input_csvs[1]
+      store = DistanceStore.load(self._distances_path, airport_csv)
+      if store is None:
+         try:
+            DistanceStore.write(self._distances_path, airport_csv)
+            store = DistanceStore(self._distances_path)
+         except (OSError, ValueError, IndexError):
+            print("Writing Distance Store Failed.\nQuitting")
+            sys.exit()
+      self._distance_store = store
+      return store
 
-   def _populate_fields(self, code):
-      """Using airport's identifying code, looks up relevant data and returns to
-      instance's attributes. Called from init method. 'country' in first loop is
-      used internally to search, in the second loop, for the currency ('found_currency')
-      in that country, from within a different dictionary. This latter value is
-      used in turn, in the third loop, to search again a different dictionary for
-      the exchange rate to Euro for that airport's country's currency.
+   def reachable_airports(self, code, radius):
+      """Returns a list of (distance, code) of every other airport within
+      radius km of the airport with code, nearest first; e.g. the airports an
+      aircraft can reach, given its range, for diversion planning.
 
       Parameters
       ----------
       code: string
-         An airport's identifying string
+         The identifying code of the airport to measure from.
+
+      radius: float
+         The greatest distance, in km.
       """
+      index = self.spatial_index()
       try:
-         for key in self._data._airport_dict:
-            if self._data._airport_dict[key]['airport_code'] == code:
-               self._found_airport_name = self._data._airport_dict[key]['airport_name']
-               self._found_latitude = self._data._airport_dict[key]['latitude']
-               self._found_longitude = self._data._airport_dict[key]['longitude']
-               self._found_country = self._data._airport_dict[key]['country']
-               break
-
-         for key in self._data._countrycurrency_dict:
-            if self._data._countrycurrency_dict[key]['currency_country_name'] \
-               == self._found_country.upper():
-               self._found_currency = self._data._countrycurrency_dict[key]['currency_alphabetic_code']
-               break
-
-         for key in self._data._currency_rates_dict:
-            if self._data._currency_rates_dict[key]['CurrencyCode'] == self._found_currency:
-               self._found_to_euro_rate = self._data._currency_rates_dict[key]['toEuro']
-               break
-
-         return self._found_airport_name,\
-               float(self._found_latitude),\
-               float(self._found_longitude),\
-               self._found_country,\
-               self._found_currency,\
-               self._found_to_euro_rate
-
-      except:
-         print("An Error Has Occurred Populating Airport Fields.\nQuitting")
+         latitude, longitude = index.coordinates(code)
+      except KeyError:
+         print("An Airport not found.\nQuitting")
          sys.exit()
 
-class Router:
-   """A class that by composition assembles Data, Aircraft, and Airport instances
-   to load the query specifics; generate permuted journies; cost the journey and
-   label illegal journeies; and return the optimal route.
+      return [(distance, other) for distance, other in
+              index.within(latitude, longitude, radius)
+              if other != code]
+
+class Snapshot:
+   """A class that reads the resolved airport records of a Data instance from
+   a compact binary file, which is memory-mapped rather than parsed, so that
+   startup reads only the pages that lookups touch, and processes reading the
+   same file share those pages. Looked up by airport code, as a dict.
+
+   The file holds a fixed header, followed by the airport codes, sorted and
+   padded to a fixed width, then latitudes, longitudes, and rates to Euro as
+   arrays of native doubles, then offsets into a block of the remaining text
+   fields. The header records the size and modification time of each source
+   csv file; a snapshot whose sources have since changed is not loaded.
 
    Attributes
    ----------
-   _aircraft_dict: dict
-      A dictionary serving as a cache for already-created aircraft objects.
+   _path: string
+      The full filepath of the snapshot file.
 
-   _airport_dict: dict
-      A dictionary serving as a cache for already-created airport objects
+   _count: int
+      The number of airports in the snapshot.
 
-   _data: Data class instance
-      Instance of the Data class passed from an instance of the Router class.
-      Contains the dictionaries representing the input csv data.
+   _codes: bytes
+      The airport codes, each _code_width bytes, in ascending order; copied
+      out of the file, as memoryviews do not compare in order.
 
-   _row: list
-      A list of strings, where each string is a value from a row of data in the
-      test.csv file. Illustration: a CSV row 'DUB,LHR,CDG,AMS,CPH,SIS99' is 
-      represented in this attribute as '['DUB', 'LHR', 'CDG', 'AMS', 'CPH', 'SIS99']' 
+   _latitudes: memoryview
+      The latitude of each airport, in the order of _codes.
 
-   _airports: list
-      A list of Airport class objects; one such object for each aircraft code
-      in the _row attribute.
+   _longitudes: memoryview
+      The longitude of each airport, in the order of _codes.
 
-   _permutations: list
-      Two dimensional list, with each inner list a permutation of all airports
-      belonging to the round trip, excluding the home / destination airport. See
-      elaboration in _generate_permutations entry, below.
+   _rates: memoryview
+      The exchange rate to Euro of each airport, in the order of _codes.
+
+   _offsets: memoryview
+      Start of each airport's text fields in _text; one more than _count.
+
+   _text: memoryview
+      The name, country, and currency of each airport, separated by
+      _separator.
+
+   _records: dict
+      Airport code -> AirportRecord, of each airport looked up so far. A
+      record is built on first lookup only, so that every Airport instance of
+      a code shares one record, and sees Data.update_rates change it.
 
    Methods
    -------
-   _calculate_distance(airport1, airport2)
-      A method that return the great circle distance (shortest distance between
-      two points on the surface of a sphere), which is calculated using the
-      Haversine formula. Method accesses the latitude and longitude attributes
-      of the two Airport class instances passed.
-
-   load_row(row)
-      A method called from main method, which passes a row of data from test.csv,
-      containing a list of destinations-to-visit and the aircraft in use. It
-      implements a cache for both airports and aircraft. New instances of Airport
-      and Aircraft are created for new airports and aircraft. Previously seen
-      airports and aircraft are drawn from the cache. Each of the 5 airports,
-      once created or drawn from the cache, are added to the _airports attribute
-      which collects them for ease of permutation in the _generate_permutations
-      method.
+   fingerprint(sources)
+      Static method that returns the size and modification time of each source.
 
-   _generate_permutations
-      Acts on the _airports attibute, which collects all 5 airports of a trip.
-      Excluding the positionally first ("home") airport, it creates permutations 
-      for the remaining 4 airports, and saves them to a _permutations attribute.
-      As the positionally first airport must always be first and last, it is not
-      included in the permutations, but methodologically accounted for in these
-      positions in the add_cost_add_flag method. Thus, illegal permutations (home
-      airport being an intermediary airport) are avoided.
+   write(path, records, sources)
+      Static method that writes the records to a snapshot file at path.
 
-   add_cost_add_flag
-      A method that adds adds two values to each permuted list of airports:
-      1) the total cost of the round-trip journey, 2) a "flag", which if boolean
-      False indicates that a step in the journey exceeds the range of the
-      aircraft, thereby invalidating the whole round-trip.
+   load(path, sources)
+      Static method that returns a Snapshot of the file at path, or None where
+      the file is missing, malformed, or out of date with its sources.
 
-   return_cheapest_route
-      A method that filters invalid journies, and returns the cheapest, valid
-      permuted round-trip.
+   _find(code)
+      Returns the position of an airport code in _codes, or -1.
    """
 
-   def __init__(self, data_store):
+   _magic = b'AIRSNAP2'
+   _header = struct.Struct('=8sI4x6q')
+   _code_width = 8
+   _separator = '\x1f'
 
-      self._aircraft_dict = dict()
-      self._airport_dict = dict()
-      self._data = data_store
+   def __init__(self, path):
+      self._path = path
 
-   def _calculate_distance(self, airport1, airport2):
-      """A method that return the great circle distance (shortest distance between
-      two points on the surface of a sphere), which is calculated using the
-      Haversine formula.
+      with open(path, 'rb') as file:
+         self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
 
-      Parameters
-      ----------
-      airport1: Airport instance
-         The first of two airports to measure the disance between
+      view = memoryview(self._mmap)
+      header = Snapshot._header.unpack_from(view)
+      self._count = count = header[1]
+      self._fingerprint = list(header[2:])
 
-      airport2: Airport instance
-         The second of two airports to measure the disance between
-      """
+      start = Snapshot._header.size
+      end = start + count * Snapshot._code_width
+      self._codes = bytes(view[start:end])
 
-      lat1 = airport1._latitude
-      lon1 = airport1._longitude
-      lat2 = airport2._latitude
-      lon2 = airport2._longitude
+      self._latitudes = view[end:end + 8*count].cast('d')
+      end += 8*count
+      self._longitudes = view[end:end + 8*count].cast('d')
+      end += 8*count
+      self._rates = view[end:end + 8*count].cast('d')
+      end += 8*count
+      self._offsets = view[end:end + 4*(count+1)].cast('I')
+      end += 4*(count+1)
+      self._text = view[end:]
 
-      R = 6372.8
+      self._records = dict()
 
-      dlat = radians(lat2 - lat1)
-      dlon = radians(lon2 - lon1)
-      lat1 = radians(lat1)
-      lat2 = radians(lat2)
+   def __reduce__(self):
+      # re-map, rather than copy, when sent to another process
+      return (Snapshot, (self._path,))
 
-      a = sin(dlat/2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon/2) ** 2
-      c = 2 * asin(sqrt(a))
+   def fingerprint(sources):
+      """Returns a flat list of the size and modification time, in nanoseconds,
+      of each source file.
 
-      return c * R
+      Parameters
+      ----------
+      sources: list
+         Filepaths of the csv files the snapshot is built from.
+      """
+      fingerprint = []
+      for source in sources:
+         status = os.stat(source)
+         fingerprint.extend([status.st_size, status.st_mtime_ns])
+      return fingerprint
 
-   def load_row(self, row):
-      """A method that takes a row (passed by main) and creates airport and 
-      aircraft objects corresponding to the identifying strings contained in the 
-      row. It checks whether the objects exist in the cache before creating. It
-      adds created objects to the cache upon creating them.
+   def write(path, records, sources):
+      """Writes records to a snapshot file at path. Writes to a temporary file
+      first, then renames it into place, so that a snapshot in use by another
+      process is never seen half written.
 
       Parameters
       ----------
-      row: list
-         A list of strings, e.g. ['DUB', 'LHR', 'CDG', 'AMS', 'CPH', 'SIS99']
-         Last element is airport. First element is "home" airport. Remaining
-         elements are intermediary airports.
+      path: string
+         The full filepath of the snapshot file.
+
+      records: dict
+         Airport code -> AirportRecord, as Data._resolved_airports.
+
+      sources: list
+         Filepaths of the 3 csv files the records are joined from.
       """
-      self._row = row
+      codes = sorted(code for code in records
+                     if len(code.encode()) <= Snapshot._code_width)
 
-      # check by aircraft code if aircraft in cache; create & add otherwise
+      latitudes = array('d')
+      longitudes = array('d')
+      rates = array('d')
+      offsets = array('I', [0])
+      text = bytearray()
 
-      if self._row[5] in self._aircraft_dict:
-         self._aircraft = self._aircraft_dict[self._row[5]]
-      else:
-         self._aircraft = Aircraft(self._data, self._row[5])
-         self._aircraft_dict[self._row[5]] = self._aircraft
-               
-      # check by airport code if airport in cache; create & add otherwise
-      # add airports to list, for _generate_permutations method
-
-      self._airports = [None,
-                        None,
-                        None,
-                        None,
-                        None] #placeholders, index 0 is home airport; 1-3 inc. are destinations
-
-      for i in range(len(self._airports)):
-         if self._row[0:5][i] in self._airport_dict:
-            self._airports[i] = self._airport_dict[self._row[0:5][i]]
-            
-         else:
-            self._airports[i] = Airport(self._data, self._row[0:5][i])
-            self._airports[i]._populate_fields(self._data)
-            self._airport_dict[self._row[0:5][i]] = self._airports[i]
+      for code in codes:
+         record = records[code]
+         latitudes.append(record._latitude)
+         longitudes.append(record._longitude)
+         rates.append(record._to_euro_rate)
+         text += Snapshot._separator.join([record._name, record._country,
+                                           record._currency]).encode()
+         offsets.append(len(text))
 
-   def _generate_permutations(self):
-      """A method that generates permutations of all aircraft, excluding the 
-      first "home" airport.
+      temporary = path + '.tmp'
+      with open(temporary, 'wb') as file:
+         file.write(Snapshot._header.pack(Snapshot._magic, len(codes),
+                                          *Snapshot.fingerprint(sources)))
+         file.write(b''.join(code.encode().ljust(Snapshot._code_width, b'\0')
+                             for code in codes))
+         latitudes.tofile(file)
+         longitudes.tofile(file)
+         rates.tofile(file)
+         offsets.tofile(file)
+         file.write(text)
+      os.replace(temporary, path)
+
+   def load(path, sources):
+      """Returns a Snapshot of the file at path, or None where the file does not
+      exist, is not a snapshot, or was built from csv files that have since
+      changed.
+
+      Parameters
+      ----------
+      path: string
+         The full filepath of the snapshot file.
+
+      sources: list
+         Filepaths of the 3 csv files the snapshot is built from.
       """
+      try:
+         with open(path, 'rb') as file:
+            header = file.read(Snapshot._header.size)
+         if len(header) < Snapshot._header.size:
+            return None
+         header = Snapshot._header.unpack(header)
+         if header[0] != Snapshot._magic or \
+            list(header[2:]) != Snapshot.fingerprint(sources):
+            return None
+         return Snapshot(path)
+      except (OSError, ValueError):
+         return None
 
-      self._permutations = [list(airport) for airport in list(permutations(self._airports[1:5]))]
+   def _find(self, code):
+      """Returns the position of the airport code in _codes by binary search,
+      or -1 where it is not present.
 
-   def add_cost_add_flag(self):
-      """A method that firstly generates the permutations. Secondly, iterates through
-      a permutation and calculates the distance and cost of each intermediary
-      journey (i.e. excluding home airport —> first destination, and final
-      destination —> home airport). Thirdly, adds the distance and cost of the 
-      first leg (home airport —> first destination). Fourthly, adds the distance
-      and cost of the last leg (final destination —> home airport). The total 
-      cost of the round trip is appended to the permutation / list. If no leg of
-      round trip exceeds the aircraft range, None is appended to the list. If a
-      leg does exceed the range, False is appended in place of None. Repeated
-      for each permutation in the _permutations list.
+      Parameters
+      ----------
+      code: string
+         An airport's identifying string
       """
+      key = code.encode().ljust(Snapshot._code_width, b'\0')
+      width = Snapshot._code_width
+      low, high = 0, self._count
+      while low < high:
+         middle = (low + high) // 2
+         if self._codes[middle*width:(middle+1)*width] < key:
+            low = middle + 1
+         else:
+            high = middle
+      if low < self._count and self._codes[low*width:(low+1)*width] == key:
+         return low
+      return -1
 
-      self._generate_permutations()
+   def __len__(self):
+      return self._count
 
-      for journey in self._permutations:
-         flag = None
-         total_distance = 0
-         cost = 0
+   def __contains__(self, code):
+      return self._find(code) >= 0
 
-         # tally distance & cost for all except outset & ending journeys
-         for i in range(len(journey)-1):
-            distance = self._calculate_distance(journey[i], journey[i+1])
-            total_distance += distance
-            if distance > self._aircraft._range:
-               flag = False
-            cost += (distance * float(journey[i]._to_euro_rate))
+   def __iter__(self):
+      width = Snapshot._code_width
+      for i in range(self._count):
+         yield self._codes[i*width:(i+1)*width].rstrip(b'\0').decode()
 
-         # add distance for the first leg of the journey
-         distance = self._calculate_distance(self._airports[0], journey[0])
-         total_distance += distance
-         if distance > self._aircraft._range:
-            flag = False
-         cost += (distance * float(self._airports[0]._to_euro_rate))
+   def __getitem__(self, code):
+      record = self._records.get(code)
+      if record is not None:
+         return record
+      i = self._find(code)
+      if i < 0:
+         raise KeyError(code)
+      name, country, currency = bytes(
+         self._text[self._offsets[i]:self._offsets[i+1]]).decode().split(
+            Snapshot._separator)
+      record = AirportRecord(name, self._latitudes[i], self._longitudes[i],
+                             country, currency, self._rates[i])
+      self._records[code] = record
+      return record
 
-         # add distance for the final leg of journey
-         distance = self._calculate_distance(self._airports[0], journey[-1])
-         total_distance += distance
-         if distance > self._aircraft._range:
-            flag = False
-         cost += (distance * float(journey[-1]._to_euro_rate))
+   def get(self, code, default=None):
+      try:
+         return self[code]
+      except KeyError:
+         return default
 
-         journey.append(round(cost, 2))
-         journey.append(flag)
+   def items(self):
+      for code in self:
+         yield code, self[code]
 
-   def return_cheapest_route(self):
-      """A method that first sets the lowest price by iterating through all
-      valid permuted routes. Secondly, linearally searches for the journey
-      matching that lowest price. Returns the home airport, and the lowest-
-      price journey.
-      """
-      lowest_price = 999_999_999
+def _great_circle_distance(lat1, lon1, lat2, lon2):
+   """Returns the great circle distance, in km, between two points given in
+   degrees of latitude and longitude, calculated using the Haversine formula.
+   Shared by Router._calculate_distance and SpatialIndex.
+   """
+   R = 6372.8
+
+   dlat = radians(lat2 - lat1)
+   dlon = radians(lon2 - lon1)
+   lat1 = radians(lat1)
+   lat2 = radians(lat2)
+
+   a = sin(dlat/2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon/2) ** 2
+   c = 2 * asin(sqrt(a))
+
+   return c * R
+
+class DistanceStore:
+   """A class that reads the great circle distance between any two airports of
+   airport.csv from a precomputed file, which is memory-mapped rather than
+   parsed, so that a lookup costs one array read in place of the Haversine
+   formula, and processes reading the same file share its pages. Built once,
+   and again only when airport.csv changes.
+
+   The file holds a fixed header, followed by the airport codes, sorted and
+   padded to a fixed width, then the distance of every pair of airports as a
+   condensed upper-triangular matrix of native single precision floats, row
+   by row: pair (i, j), for i < j, is at i*(2n - i - 1)/2 + j - i - 1. The
+   header records the size and modification time of airport.csv; a store
+   whose source has since changed is not loaded. Single precision keeps the
+   file to 4 bytes a pair, and is good to within a few metres.
+
+   Attributes
+   ----------
+   _path: string
+      The full filepath of the store file.
+
+   _count: int
+      The number of airports in the store.
+
+   _positions: dict
+      Airport code -> position in the sorted codes, and so in the matrix.
+
+   _distances: memoryview
+      The condensed matrix of distances, in km.
+
+   Methods
+   -------
+   write(path, source)
+      Static method that computes the distance of every pair of airports in
+      the csv file at source, and writes them to a store file at path.
+
+   load(path, source)
+      Static method that returns a DistanceStore of the file at path, or None
+      where the file is missing, malformed, or out of date with its source.
+
+   distance(code1, code2)
+      Returns the distance between two airports, or None where either is not
+      in the store.
+
+   matrix(codes)
+      Returns the distances between each pair of the airports, as a list of
+      rows, or None where any is not in the store.
+   """
+
+   _magic = b'AIRDIST1'
+   _header = struct.Struct('=8sI4x2q')
+   _code_width = 8
+
+   def __init__(self, path):
+      self._path = path
+
+      with open(path, 'rb') as file:
+         self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+      view = memoryview(self._mmap)
+      self._count = count = DistanceStore._header.unpack_from(view)[1]
+
+      width = DistanceStore._code_width
+      start = DistanceStore._header.size
+      end = start + count * width
+      codes = bytes(view[start:end])
+      self._positions = {codes[i*width:(i+1)*width].rstrip(b'\0').decode(): i
+                         for i in range(count)}
+      self._distances = view[end:end + 4 * (count * (count-1) // 2)].cast('f')
+
+   def __reduce__(self):
+      # re-map, rather than copy, when sent to another process
+      return (DistanceStore, (self._path,))
+
+   def write(path, source):
+      """Computes the distance of every pair of airports in airport.csv, with
+      NumPy where available, and writes them to a store file at path, a row of
+      the matrix at a time. Writes to a temporary file first, then renames it
+      into place, so that a store in use by another process is never seen half
+      written. First match wins on duplicate airport codes.
+
+      Parameters
+      ----------
+      path: string
+         The full filepath of the store file.
+
+      source: string
+         The full filepath of airport.csv.
+      """
+      positions = Data._read_coordinates(source)
+      codes = sorted(code for code in positions
+                     if len(code.encode()) <= DistanceStore._code_width)
+      latitudes = [positions[code][0] for code in codes]
+      longitudes = [positions[code][1] for code in codes]
+      n = len(codes)
+
+      temporary = path + '.tmp'
+      with open(temporary, 'wb') as file:
+         file.write(DistanceStore._header.pack(DistanceStore._magic, n,
+                                               *Snapshot.fingerprint([source])))
+         file.write(b''.join(code.encode().ljust(DistanceStore._code_width, b'\0')
+                             for code in codes))
+
+         if np is not None:
+            lat = np.radians(np.array(latitudes))
+            lon = np.radians(np.array(longitudes))
+            for i in range(n - 1):
+               dlat = lat[i+1:] - lat[i]
+               dlon = lon[i+1:] - lon[i]
+               a = np.sin(dlat/2) ** 2 + \
+                   np.cos(lat[i]) * np.cos(lat[i+1:]) * np.sin(dlon/2) ** 2
+               (2 * np.arcsin(np.sqrt(a)) * 6372.8).astype(np.float32).tofile(file)
+         else:
+            for i in range(n - 1):
+               array('f', [_great_circle_distance(latitudes[i], longitudes[i],
+                                                  latitudes[j], longitudes[j])
+                           for j in range(i+1, n)]).tofile(file)
+      os.replace(temporary, path)
+
+   def load(path, source):
+      """Returns a DistanceStore of the file at path, or None where the file
+      does not exist, is not a store, or was built from an airport.csv that
+      has since changed.
+
+      Parameters
+      ----------
+      path: string
+         The full filepath of the store file.
+
+      source: string
+         The full filepath of airport.csv.
+      """
+      try:
+         with open(path, 'rb') as file:
+            header = file.read(DistanceStore._header.size)
+         if len(header) < DistanceStore._header.size:
+            return None
+         header = DistanceStore._header.unpack(header)
+         if header[0] != DistanceStore._magic or \
+            list(header[2:]) != Snapshot.fingerprint([source]):
+            return None
+         store = DistanceStore(path)
+         if len(store._distances) != store._count * (store._count-1) // 2:
+            return None
+         return store
+      except (OSError, ValueError, TypeError):
+         return None
+
+   def __len__(self):
+      return self._count
+
+   def distance(self, code1, code2):
+      """Returns the distance, in km, between two airports, read from the
+      matrix, or None where either airport is not in the store.
+
+      Parameters
+      ----------
+      code1, code2: string
+         The identifying codes of the two airports.
+      """
+      i = self._positions.get(code1)
+      j = self._positions.get(code2)
+      if i is None or j is None:
+         return None
+      if i == j:
+         return 0.0
+      if i > j:
+         i, j = j, i
+      return self._distances[i * (2*self._count - i - 1) // 2 + j - i - 1]
+
+   def matrix(self, codes):
+      """Returns the distance, in km, between each pair of the airports, as a
+      list of rows, as Router._build_matrices builds; or None where any airport
+      is not in the store. Positions are looked up once per airport, rather
+      than once per pair, and each pair is read once.
+
+      Parameters
+      ----------
+      codes: list
+         The identifying codes of the airports, in the order of the rows.
+      """
+      positions = [self._positions.get(code) for code in codes]
+      if None in positions:
+         return None
+
+      distances = self._distances
+      count = self._count
+      n = len(positions)
+      matrix = [[0.0] * n for _ in range(n)]
+      for i in range(n):
+         p = positions[i]
+         for j in range(i+1, n):
+            q = positions[j]
+            if p < q:
+               distance = distances[p * (2*count - p - 1) // 2 + q - p - 1]
+            elif p > q:
+               distance = distances[q * (2*count - q - 1) // 2 + p - q - 1]
+            else:
+               distance = 0.0
+            matrix[i][j] = distance
+            matrix[j][i] = distance
+      return matrix
+
+class SpatialIndex:
+   """A class that indexes airports by position, for queries of every airport
+   within a radius, e.g. an aircraft's range, and of the k nearest airports,
+   in sub-linear time. Each airport is placed as a unit vector in 3D, so that
+   straight-line (chord) distance between vectors increases with great circle
+   distance, and the vectors are held in a k-d tree. The tree is implicit:
+   points are reordered so that each subtree is a contiguous slice, split at
+   its median on the x, y, and z axes in turn. Candidates found by chord
+   distance are measured by the Haversine formula before being returned, so
+   that results match a brute-force search with Router._calculate_distance.
+
+   Attributes
+   ----------
+   _codes: list
+      Airport codes, in tree order.
+
+   _latitudes: list
+      Latitude of each airport, in tree order.
+
+   _longitudes: list
+      Longitude of each airport, in tree order.
+
+   _points: list
+      Unit vector (x, y, z) of each airport, in tree order.
+
+   _xs, _ys, _zs: list
+      Components of _points, held apart for speed of the radius query.
+
+   _cos_latitudes: list
+      Cosine of each airport's latitude, for the Haversine formula.
+
+   _positions: dict
+      Airport code -> position in tree order.
+
+   Methods
+   -------
+   _unit_vector(latitude, longitude)
+      Static method that returns the unit vector of a position.
+
+   _build(low, high, depth)
+      Reorders _points[low:high] into a k-d subtree.
+
+   within(latitude, longitude, radius)
+      Returns every airport within radius km of a position.
+
+   nearest(latitude, longitude, k)
+      Returns the k airports nearest a position.
+
+   coordinates(code)
+      Returns the latitude and longitude of an indexed airport.
+   """
+
+   # subtrees of at most this many points are searched exhaustively
+   _leaf_size = 8
+
+   # chord distances are compared with this slack, then checked exactly
+   _tolerance = 1e-9
+
+   def __init__(self, coordinates):
+      """Builds the tree from coordinates, a mapping of airport code ->
+      (latitude, longitude), such as Data._read_coordinates returns.
+      """
+      points = []
+      for code, (latitude, longitude) in coordinates.items():
+         points.append((SpatialIndex._unit_vector(latitude, longitude),
+                        code, latitude, longitude))
+
+      self._build_points = points
+      self._build(0, len(points), 0)
+
+      self._points = [point[0] for point in points]
+      self._xs = [point[0][0] for point in points]
+      self._ys = [point[0][1] for point in points]
+      self._zs = [point[0][2] for point in points]
+      self._cos_latitudes = [cos(radians(point[2])) for point in points]
+      self._codes = [point[1] for point in points]
+      self._latitudes = [point[2] for point in points]
+      self._longitudes = [point[3] for point in points]
+      self._positions = {code: i for i, code in enumerate(self._codes)}
+      del self._build_points
+
+   def _unit_vector(latitude, longitude):
+      """Returns the unit vector (x, y, z) of a position given in degrees."""
+      latitude = radians(latitude)
+      longitude = radians(longitude)
+      return (cos(latitude) * cos(longitude),
+              cos(latitude) * sin(longitude),
+              sin(latitude))
+
+   def _build(self, low, high, depth):
+      """Reorders the points in [low, high) so that the median on axis depth % 3
+      is at the middle, with lesser points before it and greater after, then
+      does likewise for each half, until halves are no larger than a leaf.
+      """
+      if high - low <= SpatialIndex._leaf_size:
+         return
+      axis = depth % 3
+      middle = (low + high) // 2
+      self._build_points[low:high] = sorted(self._build_points[low:high],
+                                            key=lambda point: point[0][axis])
+      self._build(low, middle, depth + 1)
+      self._build(middle + 1, high, depth + 1)
+
+   def _chord_squared(point, target):
+      """Returns the squared straight-line distance between two unit vectors."""
+      return ((point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2 +
+              (point[2] - target[2]) ** 2)
+
+   def within(self, latitude, longitude, radius, ordered=True):
+      """Returns a list of (distance, code) of every airport within radius km
+      of the position, by great circle distance, nearest first unless ordered
+      is False.
+
+      Parameters
+      ----------
+      latitude: float
+         Latitude of the position, in degrees.
+
+      longitude: float
+         Longitude of the position, in degrees.
+
+      radius: float
+         The greatest distance, in km, e.g. an aircraft's range.
+
+      ordered: bool
+         Whether to sort the results by distance.
+      """
+      angle = min(radius / 6372.8, pi)
+      limit = (2 * sin(angle / 2)) ** 2 + SpatialIndex._tolerance
+      target = SpatialIndex._unit_vector(latitude, longitude)
+
+      tx, ty, tz = target
+      xs, ys, zs = self._xs, self._ys, self._zs
+      axes = (xs, ys, zs)
+      leaf_size = SpatialIndex._leaf_size
+
+      found = []
+      stack = [(0, len(xs), 0)]
+      while stack:
+         low, high, depth = stack.pop()
+         if high - low <= leaf_size:
+            for i in range(low, high):
+               if (xs[i]-tx) ** 2 + (ys[i]-ty) ** 2 + (zs[i]-tz) ** 2 <= limit:
+                  found.append(i)
+            continue
+
+         middle = (low + high) // 2
+         if (xs[middle]-tx) ** 2 + (ys[middle]-ty) ** 2 + (zs[middle]-tz) ** 2 <= limit:
+            found.append(middle)
+
+         offset = target[depth % 3] - axes[depth % 3][middle]
+         if offset <= 0 or offset ** 2 <= limit:
+            stack.append((low, middle, depth + 1))
+         if offset >= 0 or offset ** 2 <= limit:
+            stack.append((middle + 1, high, depth + 1))
+
+      # the Haversine formula, as _great_circle_distance, with each airport's
+      # cosine of latitude precomputed
+      latitudes, longitudes = self._latitudes, self._longitudes
+      cos_latitudes, codes = self._cos_latitudes, self._codes
+      cos_latitude = cos(radians(latitude))
+      results = []
+      for i in found:
+         a = sin(radians(latitudes[i] - latitude)/2) ** 2 + \
+             cos_latitude * cos_latitudes[i] * \
+             sin(radians(longitudes[i] - longitude)/2) ** 2
+         distance = 2 * asin(sqrt(a)) * 6372.8
+         if distance <= radius:
+            results.append((distance, codes[i]))
+      if ordered:
+         results.sort()
+      return results
+
+   def coordinates(self, code):
+      """Returns the latitude and longitude of the indexed airport with code.
+
+      Parameters
+      ----------
+      code: string
+         An airport's identifying string
+      """
+      i = self._positions[code]
+      return self._latitudes[i], self._longitudes[i]
+
+   def nearest(self, latitude, longitude, k):
+      """Returns a list of (distance, code) of the k airports nearest the
+      position, by great circle distance, nearest first.
+
+      Parameters
+      ----------
+      latitude: float
+         Latitude of the position, in degrees.
+
+      longitude: float
+         Longitude of the position, in degrees.
+
+      k: int
+         The number of airports to return.
+      """
+      if k <= 0:
+         return []
+      target = SpatialIndex._unit_vector(latitude, longitude)
+
+      # max-heap of the k nearest so far, by negated squared chord
+      heap = []
+
+      def consider(i):
+         chord = SpatialIndex._chord_squared(self._points[i], target)
+         if len(heap) < k:
+            heapq.heappush(heap, (-chord, i))
+         elif chord < -heap[0][0]:
+            heapq.heapreplace(heap, (-chord, i))
+
+      def worst():
+         if len(heap) < k:
+            return float('inf')
+         return -heap[0][0] + SpatialIndex._tolerance
+
+      def search(low, high, depth):
+         if high - low <= SpatialIndex._leaf_size:
+            for i in range(low, high):
+               consider(i)
+            return
+
+         axis = depth % 3
+         middle = (low + high) // 2
+         consider(middle)
+
+         offset = target[axis] - self._points[middle][axis]
+         near, far = (low, middle), (middle + 1, high)
+         if offset > 0:
+            near, far = far, near
+         search(near[0], near[1], depth + 1)
+         if offset ** 2 <= worst():
+            search(far[0], far[1], depth + 1)
+
+      search(0, len(self._points), 0)
+
+      results = [(_great_circle_distance(latitude, longitude, self._latitudes[i],
+                                         self._longitudes[i]), self._codes[i])
+                 for _, i in heap]
+      results.sort()
+      return results
+
+class Aircraft:
+   """A class that takes an identifying aircraft code and collects data regarding
+   that aircraft, specifically its range, which is normalised to metric units.
+
+   Attributes
+   ----------
+   _aircraft_code: string
+      A string which identifies a particular aircraft, for which there is
+      information on in the Data instance's _aircraft_index.
+
+   _data: Data class instance
+      Instance of the Data class passed from an instance of the Router class.
+      Contains the dictionaries representing the input csv data.
+
+   _range: float
+      Number representing the maximum range of the aircraft.
+
+   Methods
+   -------
+   _lookup_range(code):
+      A method that takes the aircraft code and performs a lookup in _data for
+      that aircraft's range, already normalised to metric.
+   """
+
+   __slots__ = ('_aircraft_code', '_data', '_range')
+
+   def __init__(self, data_store, aircraft_code):
+      self._aircraft_code = aircraft_code
+      self._data = data_store
+      self._range = self._lookup_range(self._aircraft_code)
+
+   def _lookup_range(self, code):
+      """ Sets aircraft's _range attribute with normalised range (km), which is 
+      looked up in the Data instance's _aircraft_index, where ranges given in
+      imperial units have already been converted. Called from Class' init
+      method.
+
+      Parameters
+      ----------
+      code: string
+         Identifying aircraft code, which is first passed to the init method.
+      """
+      try:
+         return self._data._aircraft_index[code]
+      except KeyError:
+         print("An Aircraft Code Was Not Found.\nQuitting")
+         sys.exit()
+
+class Airport:
+   """A class that takes an identifying airport code and presents data regarding
+   that airport. A lightweight view over the airport's AirportRecord in the
+   Data instance, which holds the fields; the view holds only the code, the
+   data source, and the record.
+
+   Attributes
+   ----------
+   _airport_code: string:
+      A string which identifies a particular airport, for which there is
+      information on in the Data instance's _resolved_airports.
+
+   _data: Data class instance
+      Instance of the Data class passed from an instance of the Router class.
+      Contains the dictionaries representing the input csv data.
+
+   _record: AirportRecord
+      The airport's record, from which the following are read.
+
+   _airport_name: string
+      A string representation of the airport's name.
+
+   _latitude: float
+      The latitudinal coordinates of the airport.
+
+   _longitude: float
+      The longitudinal coordinates of the airport.
+
+   _country: string
+      A string representation of the country in which the airport exists.
+
+   _currency: string
+      A string representation of the currency alphabetic code, identifying the
+      currency used in the country in which the airport is.
+
+   _to_euro_rate: float
+      The exchange rate from the currency used in country in which the airport
+      is to Euro.
+
+   Methods
+   -------
+   _populate_fields(code)
+      A method that takes an airport's identifying code and returns the
+      resolved record for that airport in the data source.
+   """
+
+   __slots__ = ('_airport_code', '_data', '_record')
+
+   def __init__(self, data_store, airport_code):
+      self._airport_code = airport_code
+      self._data = data_store
+
+      try:
+         self._record = self._populate_fields(self._airport_code)
+
+      # not bare, so that _populate_fields quitting on an unknown code is not
+      # caught
+      except Exception:
+         print("An Airport not found.\nQuitting")
+         sys.exit()
+
+   def _populate_fields(self, code):
+      """Using airport's identifying code, looks up and returns the airport's
+      record. Called from init method. The record is drawn from the Data
+      instance's _resolved_airports, in which the airport's country, currency,
+      and exchange rate to Euro have already been joined.
+
+      Parameters
+      ----------
+      code: string
+         An airport's identifying string
+      """
+      try:
+         return self._data._resolved_airports[code]
+
+      except KeyError:
+         print("An Error Has Occurred Populating Airport Fields.\nQuitting")
+         sys.exit()
+
+   @property
+   def _airport_name(self):
+      return self._record._name
+
+   @property
+   def _latitude(self):
+      return self._record._latitude
+
+   @property
+   def _longitude(self):
+      return self._record._longitude
+
+   @property
+   def _country(self):
+      return self._record._country
+
+   @property
+   def _currency(self):
+      return self._record._currency
+
+   @property
+   def _to_euro_rate(self):
+      return self._record._to_euro_rate
+
+class RouteCache:
+   """A class that caches the cheapest route found for a query across rows and,
+   optionally, across runs, so that recurring rotations are not solved again.
+   A query is keyed by its home airport, its set of destinations, the range
+   of its aircraft, the method by which it is solved, and the version of the
+   currency rates, so that routes costed at old rates, or found by the
+   heuristic, are never returned in place of exact ones. Least recently used
+   routes are evicted beyond a fixed capacity.
+
+   Attributes
+   ----------
+   _capacity: int
+      The greatest number of routes held.
+
+   _path: string
+      The full filepath of the file to which the cache persists, or None for a
+      cache held only in memory.
+
+   _routes: OrderedDict
+      Key -> cached route, least recently used first. A cached route is the
+      list of destination codes in order, and the cost; or None where no
+      valid round-trip exists.
+
+   _version: string
+      The rates version of the routes held. A key of any other version clears
+      the cache, setting aside its routes as _previous.
+
+   _previous: dict
+      Key without its version -> route cached under the version before
+      _version. Rates do not change which routes are valid, so these are
+      starting points from which to solve the same query again.
+
+   _hits: int
+      The number of lookups that found a cached route.
+
+   _misses: int
+      The number of lookups that did not.
+
+   Methods
+   -------
+   key(home, destinations, aircraft_range, version, method)
+      Static method that returns the key of a query.
+
+   get(key)
+      Returns the cached route for key, or _missing.
+
+   put(key, route)
+      Caches the route for key, evicting the least recently used beyond
+      _capacity.
+
+   previous(key)
+      Returns the route cached for key's query under the previous version,
+      or _missing.
+
+   save
+      Writes the cached routes to _path, where given.
+   """
+
+   # returned by get where no route is cached, as None is a cached route
+   _missing = object()
+
+   def __init__(self, capacity=1024, path=None):
+      self._capacity = capacity
+      self._path = path
+      self._routes = OrderedDict()
+      self._version = None
+      self._previous = dict()
+      self._hits = 0
+      self._misses = 0
+
+      if path is not None and os.path.exists(path):
+         self._load()
+
+   def key(home, destinations, aircraft_range, version, method='exact'):
+      """Returns the key of a query. Destinations are unordered, as the route
+      found does not depend on the order in which they are given. The version
+      is last, so that the rest of the key identifies the query across
+      versions.
+
+      Parameters
+      ----------
+      home: string
+         The home airport's code.
+
+      destinations: iterable
+         The destination airports' codes.
+
+      aircraft_range: float
+         The aircraft's range, in km.
+
+      version: string
+         The rates version of the Data instance, Data._rates_version.
+
+      method: string
+         How the route is found, as given by Router._cache_method: 'exact' for
+         any exact solver, or the heuristic and its budgets, with any options
+         that change the route or its cost.
+      """
+      return home, frozenset(destinations), aircraft_range, method, version
+
+   def _check_version(self, version):
+      """Clears the cache where version differs from that of the routes held,
+      i.e. the currency rates have changed since they were cached, keeping
+      the routes cleared in _previous.
+      """
+      if version != self._version:
+         if self._routes:
+            self._previous = {key[:-1]: route for key, route in self._routes.items()}
+         self._routes.clear()
+         self._version = version
+
+   def previous(self, key):
+      """Returns the route cached for the query of key under the rates version
+      before the current one, or RouteCache._missing where there is none.
+
+      Parameters
+      ----------
+      key: tuple
+         A key, as returned by RouteCache.key.
+      """
+      self._check_version(key[-1])
+      return self._previous.get(key[:-1], RouteCache._missing)
+
+   def get(self, key):
+      """Returns the cached route for key, marking it most recently used, or
+      RouteCache._missing where there is none.
+
+      Parameters
+      ----------
+      key: tuple
+         A key, as returned by RouteCache.key.
+      """
+      self._check_version(key[-1])
+      if key in self._routes:
+         self._routes.move_to_end(key)
+         self._hits += 1
+         return self._routes[key]
+      self._misses += 1
+      return RouteCache._missing
+
+   def put(self, key, route):
+      """Caches route for key, evicting the least recently used route where
+      the cache is full.
+
+      Parameters
+      ----------
+      key: tuple
+         A key, as returned by RouteCache.key.
+
+      route: list
+         The destination codes in order and the cost, or None.
+      """
+      self._check_version(key[-1])
+      self._routes[key] = route
+      self._routes.move_to_end(key)
+      while len(self._routes) > self._capacity:
+         self._routes.popitem(last=False)
+
+   def _load(self):
+      """Reads cached routes from _path, written by save. A file that cannot
+      be read is ignored, leaving the cache empty.
+      """
+      try:
+         with open(self._path) as file:
+            saved = json.load(file)
+         self._version = saved['version']
+         for home, destinations, aircraft_range, method, route in saved['routes']:
+            self._routes[RouteCache.key(home, destinations, aircraft_range,
+                                        self._version, method)] = route
+         while len(self._routes) > self._capacity:
+            self._routes.popitem(last=False)
+      except (OSError, ValueError, KeyError, TypeError):
+         self._routes.clear()
+         self._version = None
+
+   def save(self):
+      """Writes the cached routes, least recently used first, to _path, where
+      given. Writes to a temporary file first, then renames it into place.
+      """
+      if self._path is None:
+         return
+
+      routes = [[home, sorted(destinations), aircraft_range, method, route]
+                for (home, destinations, aircraft_range, method, _), route
+                in self._routes.items()]
+      try:
+         temporary = self._path + '.tmp'
+         with open(temporary, 'w') as file:
+            json.dump({'version': self._version, 'routes': routes}, file)
+         os.replace(temporary, self._path)
+      except OSError:
+         print("Writing Route Cache Failed.")
+
+class Profile:
+   """A class that records, for a run, the time spent in each stage and counts
+   of the work done, for the --profile option. Stages are timed with
+   perf_counter around whole stages, never inside the loop over permutations,
+   and counts are added once per stage, so recording costs little; where no
+   Profile is given, nothing is recorded at all.
+
+   Attributes
+   ----------
+   _timers: dict
+      Stage name -> [total seconds, number of times timed].
+
+   _counters: dict
+      Counter name -> count.
+
+   Methods
+   -------
+   start
+      Static method that returns the time at which a stage starts.
+
+   stop(stage, started)
+      Adds the time since started to stage.
+
+   count(counter, n)
+      Adds n to counter.
+
+   merge(other)
+      Adds another Profile's timers and counters to this one.
+
+   as_dict
+      Returns the timers and counters, as written by --profile.
+   """
+
+   __slots__ = ('_timers', '_counters')
+
+   def __init__(self):
+      self._timers = dict()
+      self._counters = dict()
+
+   start = staticmethod(time.perf_counter)
+
+   def stop(self, stage, started):
+      """Adds the time since started, as returned by start, to stage.
+
+      Parameters
+      ----------
+      stage: string
+         The name of the stage timed.
+
+      started: float
+         The time at which the stage started.
+      """
+      elapsed = time.perf_counter() - started
+      timer = self._timers.get(stage)
+      if timer is None:
+         self._timers[stage] = [elapsed, 1]
+      else:
+         timer[0] += elapsed
+         timer[1] += 1
+
+   def count(self, counter, n=1):
+      """Adds n to counter.
+
+      Parameters
+      ----------
+      counter: string
+         The name of the counter.
+
+      n: int
+         The amount to add.
+      """
+      self._counters[counter] = self._counters.get(counter, 0) + n
+
+   def merge(self, other):
+      """Adds the timers and counters of other, e.g. recorded in a worker
+      process, to this Profile.
+
+      Parameters
+      ----------
+      other: Profile instance
+         The Profile to add.
+      """
+      for stage, (seconds, calls) in other._timers.items():
+         timer = self._timers.setdefault(stage, [0.0, 0])
+         timer[0] += seconds
+         timer[1] += calls
+      for counter, n in other._counters.items():
+         self.count(counter, n)
+
+   def as_dict(self):
+      """Returns the timers, as seconds and calls per stage, and the counters,
+      each sorted by name.
+      """
+      return {'timers': {stage: {'seconds': seconds, 'calls': calls}
+                         for stage, (seconds, calls) in sorted(self._timers.items())},
+              'counters': dict(sorted(self._counters.items()))}
+
+class ParetoFront:
+   """A class holding the routes, among those added, that no other route
+   added beats on both cost and distance: the trade-off between the two. Each
+   route added is checked against the front once, so a front is built in a
+   single pass over the routes, holding only the routes on it. Routers add
+   costs rounded to the cent and distances to the metre, so that a route and
+   its reverse, of equal distance but summed in another order, compare equal.
+
+   Attributes
+   ----------
+   _costs: list
+      The costs of the routes on the front, ascending.
+
+   _distances: list
+      The distances of the routes on the front, in the same order, and so
+      descending.
+
+   _routes: list
+      The routes on the front, in the same order, as added.
+
+   Methods
+   -------
+   dominated(cost, distance)
+      Returns whether a route on the front costs and flies no more.
+
+   add(cost, distance, route)
+      Adds route where not dominated, removing the routes it dominates.
+
+   routes
+      Returns the cost, distance, and route of each route on the front.
+   """
+
+   __slots__ = ('_costs', '_distances', '_routes')
+
+   def __init__(self):
+      self._costs = []
+      self._distances = []
+      self._routes = []
+
+   def dominated(self, cost, distance):
+      """Returns whether some route on the front costs no more than cost and
+      flies no further than distance, so that a route, or any route of a
+      branch, bounded below by them cannot join the front.
+
+      Parameters
+      ----------
+      cost: float
+         The cost of a route, or a lower bound on it.
+
+      distance: float
+         The distance of a route, or a lower bound on it.
+      """
+      # the cheapest route costing no more has the shortest distance of those
+      i = bisect.bisect_right(self._costs, cost)
+      return i > 0 and self._distances[i-1] <= distance
+
+   def add(self, cost, distance, route):
+      """Adds route to the front, unless dominated, and removes the routes on
+      the front which it dominates. Of routes equal on both, the first added
+      is kept. Returns whether route was added.
+
+      Parameters
+      ----------
+      cost: float
+         The route's cost.
+
+      distance: float
+         The route's distance.
+
+      route: object
+         The route, as held and returned by routes.
+      """
+      if self.dominated(cost, distance):
+         return False
+
+      i = bisect.bisect_left(self._costs, cost)
+      end = i
+      while end < len(self._costs) and self._distances[end] >= distance:
+         end += 1
+      self._costs[i:end] = [cost]
+      self._distances[i:end] = [distance]
+      self._routes[i:end] = [route]
+      return True
+
+   def routes(self):
+      """Returns a list of the cost, distance, and route of each route on the
+      front, cheapest first.
+      """
+      return list(zip(self._costs, self._distances, self._routes))
+
+class Router:
+   """A class that by composition assembles Data, Aircraft, and Airport instances
+   to load the query specifics; generate permuted journies; cost the journey and
+   label illegal journeies; and return the optimal route.
+
+   Attributes
+   ----------
+   _aircraft_dict: dict
+      A dictionary serving as a cache for already-created aircraft objects.
+
+   _airport_dict: dict
+      A dictionary serving as a cache for already-created airport objects
+
+   _data: Data class instance
+      Instance of the Data class passed from an instance of the Router class.
+      Contains the dictionaries representing the input csv data.
+
+   _row: list
+      A list of strings, where each string is a value from a row of data in the
+      test.csv file. Illustration: a CSV row 'DUB,LHR,CDG,AMS,CPH,SIS99' is 
+      represented in this attribute as '['DUB', 'LHR', 'CDG', 'AMS', 'CPH', 'SIS99']' 
+
+   _airports: list
+      A list of Airport class objects; one such object for each aircraft code
+      in the _row attribute.
+
+   _permutations: list
+      Two dimensional list, with each inner list a permutation of all airports
+      belonging to the round trip, excluding the home / destination airport. See
+      elaboration in _generate_permutations entry, below. Only populated by
+      add_cost_add_flag; solve streams permutations without collecting them.
+
+   _distances: list
+      Two dimensional list, an n x n matrix of great circle distances between
+      each pair of airports in _airports, indexed by position in _airports.
+
+   _leg_costs: list
+      Two dimensional list, an n x n matrix of the cost of flying each leg,
+      being the distance multiplied by the departure airport's rate to Euro.
+
+   _in_range: list
+      Two dimensional list, an n x n matrix of booleans, True where the leg's
+      distance does not exceed the aircraft's range.
+
+   _solver: string
+      The name of the method used to find the cheapest route: 'permutations',
+      'held_karp', 'branch_and_bound', 'vectorised', 'heuristic', or 'auto',
+      which uses permutations for rows of up to _enumeration_limit
+      destinations, Held-Karp up to _exact_limit, and the heuristic beyond.
+      'vectorised' enumerates permutations as NumPy does, and needs NumPy.
+
+   _chunk_size: int
+      The greatest number of permutations costed at once by the vectorised
+      solver, bounding its memory use.
+
+   _cache: RouteCache instance
+      Cache of routes already found, shared across rows, or None.
+
+   _time_budget: float
+      Seconds the heuristic solver may spend improving a route, or None for
+      no limit.
+
+   _iteration_budget: int
+      Rounds of improvement the heuristic solver may make, or None for no
+      limit. The heuristic stops at whichever budget is reached first.
+
+   _report_gap: bool
+      Whether the heuristic solver also finds the optimum, where the row has
+      at most _gap_limit destinations, to report its gap; off by default, as
+      that time is beyond the heuristic's budget.
+
+   _gap: float
+      The fraction by which the last heuristic route's cost exceeds the
+      optimum, where _report_gap is set and the row is small enough to find
+      the optimum, else None.
+
+   _search_stopped: bool
+      Whether the last top_routes or pareto_routes search was stopped at the
+      time budget, before it could show the routes it returned are the
+      cheapest.
+
+   _profile: Profile instance
+      Records the time spent in each stage and counts of the work done, or
+      None, the default, to record nothing.
+
+   _refuel: bool
+      Whether legs beyond the aircraft's range are flown via refuelling stops
+      at other airports, rather than ruling out the journeys that take them.
+
+   _refuel_stops: dict
+      (i, j) -> list of the codes of the refuelling stops on the leg from
+      _airports[i] to _airports[j], for each such leg of the loaded row.
+
+   _refuel_paths: dict
+      Cache, across rows, of the cheapest refuelling path between two airports
+      for an aircraft range and rates version; see _refuel_paths_from.
+
+   _nodes_explored: int
+      The number of partial routes extended by the last branch and bound
+      search.
+
+   _nodes_pruned: int
+      The number of partial routes discarded by the last branch and bound
+      search, either for a leg out of range or for a lower bound no better
+      than the cheapest route found so far.
+
+   Methods
+   -------
+   _calculate_distance(airport1, airport2)
+      A method that return the great circle distance (shortest distance between
+      two points on the surface of a sphere), which is calculated using the
+      Haversine formula. Method accesses the latitude and longitude attributes
+      of the two Airport class instances passed.
+
+   load_row(row)
+      A method called from main method, which passes a row of data from test.csv,
+      containing a list of destinations-to-visit and the aircraft in use. It
+      implements a cache for both airports and aircraft. New instances of Airport
+      and Aircraft are created for new airports and aircraft. Previously seen
+      airports and aircraft are drawn from the cache. Each of the row's
+      airports, once created or drawn from the cache, are added to the _airports
+      attribute which collects them for ease of permutation in the
+      _generate_permutations method.
+
+   _build_matrices
+      Computes the _distances, _leg_costs and _in_range matrices once for the
+      loaded row, so that costing permutations needs only table lookups.
+
+   _refuel_paths_from(origin, destinations)
+      Returns the cheapest way to fly from one airport to each of several via
+      refuelling stops, each hop within the aircraft's range.
+
+   route_codes(best_route)
+      Returns the codes of every airport of a route in order, including
+      refuelling stops.
+
+   route_distance(best_route)
+      Returns the distance flown on a route, in km, including refuelling
+      stops.
+
+   _generate_permutations
+      Acts on the _airports attibute, which collects all airports of a trip.
+      Excluding the positionally first ("home") airport, it returns a lazy
+      iterator over permutations of the remaining airports.
+      As the positionally first airport must always be first and last, it is not
+      included in the permutations, but methodologically accounted for in these
+      positions in the _cost_journeys method. Thus, illegal permutations (home
+      airport being an intermediary airport) are avoided.
+
+   _cost_journeys
+      A generator that yields the cost and flag of each permutation in turn,
+      without holding the permutations in memory.
+
+   add_cost_add_flag
+      A method that collects every permutation in the _permutations attribute
+      and adds two values to each permuted list of airports:
+      1) the total cost of the round-trip journey, 2) a "flag", which if boolean
+      False indicates that a step in the journey exceeds the range of the
+      aircraft, thereby invalidating the whole round-trip.
+
+   return_cheapest_route
+      A method that filters invalid journies, and returns the cheapest, valid
+      permuted round-trip, in one pass.
+
+   _stream_cheapest_routes(k)
+      A method that consumes _cost_journeys keeping only the k cheapest valid
+      round-trips, so that memory is constant in the number of permutations.
+
+   _stream_pareto_routes
+      A method that consumes _cost_journeys keeping only the valid round-trips
+      on the cost/distance front.
+
+   _front_routes(front)
+      A method that returns the routes of a ParetoFront as journeys.
+
+   _bounded_routes(k, incumbent)
+      A method that finds the k cheapest valid round-trips, or the cost/
+      distance front, by branch and bound, within the time budget.
+
+   _route_positions(best_route)
+      A method that returns the positions of a route's destinations.
+
+   top_routes(k, best_route)
+      A method that returns the k cheapest valid round-trips, in one pass.
+
+   pareto_routes(best_route)
+      A method that returns the valid round-trips on the cost/distance front,
+      in one pass.
+
+   _held_karp
+      A method that finds the cheapest valid round-trip by dynamic programming
+      over subsets of destinations, in O(n² · 2ⁿ) time rather than O(n!).
+
+   _branch_and_bound
+      A method that finds the cheapest valid round-trip by depth-first search
+      over partial routes, pruning on range and on a lower bound of the cost.
+
+   _extend(current, order, unvisited, partial, remaining_bound)
+      Recursive step of _branch_and_bound, extending one partial route by each
+      unvisited destination in turn.
+
+   _vectorised_blocks(with_distances)
+      A generator that costs every permutation, as with _cost_journeys, in
+      blocks of integer index arrays using NumPy rather than one journey at a
+      time.
+
+   _vectorised
+      A method that returns the cheapest valid round-trip from the blocks of
+      _vectorised_blocks.
+
+   _vectorised_top(k)
+      A method that returns the k cheapest valid round-trips from the blocks
+      of _vectorised_blocks.
+
+   _vectorised_pareto
+      A method that returns the valid round-trips on the cost/distance front
+      from the blocks of _vectorised_blocks.
+
+   _heuristic
+      A method that finds a cheap valid round-trip for rows too long to solve
+      exactly, by nearest neighbour then local search, within a budget.
+
+   _tour_cost(tour)
+      Returns the cost of a round-trip of positions, or infinity where a leg
+      is out of range.
+
+   _local_search(tour, cost, deadline)
+      Improves a round-trip by 2-opt and Or-opt moves until neither helps.
+
+   _counted(journeys)
+      A generator that counts the journeys costed into _profile, when
+      profiling.
+
+   solve
+      A method that returns the cheapest valid round-trip for the loaded row,
+      from the cache where present, or using the solver the Router was
+      created with.
+
+   compare_fleet(airport_codes, aircraft_codes)
+      A method that returns the cheapest valid round-trip for one set of
+      airports for each of several aircraft, costing the routes once.
+
+   _compare_fleet_single_pass(fleet)
+      A method that finds the routes of compare_fleet in one pass over the
+      permutations.
+
+   split_routes(airport_codes, aircraft_codes, workers, every_aircraft,
+                max_stops)
+      A method that assigns one set of destinations among several aircraft,
+      and orders each aircraft's round-trip, at the least total cost.
+
+   _solve_cached
+      A method that returns the cheapest valid round-trip for the loaded row,
+      from the cache where present.
+
+   _cache_method
+      A method that returns how the loaded row's route is found, as part of
+      its cache key.
+
+   _solve_warm(previous)
+      A method that solves the loaded row again after the rates changed,
+      starting from the route previously found.
+
+   update_rates(changed)
+      A method that recosts the legs of the loaded row departing airports
+      whose currency's rate changed.
+
+   _row_solver
+      A method that returns the solver used for the loaded row.
+
+   _solve_uncached
+      A method that returns the cheapest valid round-trip for the loaded row
+      using the solver the Router was created with.
+   """
+
+   _solvers = ('auto', 'permutations', 'held_karp', 'branch_and_bound',
+               'vectorised', 'heuristic')
+
+   # 'auto' enumerates permutations up to this many destinations
+   _enumeration_limit = 8
+
+   # split_routes weighs every subset of up to this many destinations
+   _split_limit = 14
+
+   # 'auto' uses Held-Karp up to this many destinations, the heuristic beyond
+   _exact_limit = 16
+
+   # the heuristic gives up looking for a first valid route after stepping
+   # back from this many dead ends
+   _backtrack_limit = 10000
+
+   # where asked, the heuristic reports its gap to Held-Karp's optimum up to
+   # this many destinations, for which Held-Karp takes a few hundredths of a
+   # second
+   _gap_limit = 12
+
+   def __init__(self, data_store, solver='auto', chunk_size=40320, cache=None,
+                refuel=False, time_budget=1.0, iteration_budget=None,
+                profile=None, report_gap=False):
+
+      self._aircraft_dict = dict()
+      self._airport_dict = dict()
+      self._data = data_store
+
+      if solver not in Router._solvers:
+         print("Unknown Solver '{0}'.\nQuitting".format(solver))
+         sys.exit()
+      if solver == 'vectorised' and np is None:
+         print("The Vectorised Solver Requires NumPy.\nQuitting")
+         sys.exit()
+      if time_budget is None and iteration_budget is None:
+         print("The Heuristic Solver Requires a Time or Iteration Budget.\nQuitting")
+         sys.exit()
+      self._solver = solver
+      self._chunk_size = chunk_size
+      self._cache = cache
+      self._refuel = refuel
+      self._time_budget = time_budget
+      self._iteration_budget = iteration_budget
+      self._report_gap = report_gap
+      self._gap = None
+      self._search_stopped = False
+      self._profile = profile
+      self._airports = []
+      self._refuel_paths = dict()
+      self._refuel_stops = dict()
+
+   def _calculate_distance(self, airport1, airport2):
+      """A method that return the great circle distance (shortest distance between
+      two points on the surface of a sphere), which is calculated using the
+      Haversine formula.
+
+      Parameters
+      ----------
+      airport1: Airport instance
+         The first of two airports to measure the disance between
+
+      airport2: Airport instance
+         The second of two airports to measure the disance between
+      """
+
+      return _great_circle_distance(airport1._latitude, airport1._longitude,
+                                    airport2._latitude, airport2._longitude)
+
+   def load_row(self, row):
+      """A method that takes a row (passed by main) and creates airport and 
+      aircraft objects corresponding to the identifying strings contained in the 
+      row. It checks whether the objects exist in the cache before creating. It
+      adds created objects to the cache upon creating them. Rows may be of any
+      length; empty fields, as left by padding shorter rows in a CSV, are
+      skipped. A row must name at least one destination after its home
+      airport, and no airport twice, as cached routes are keyed by the set of
+      destinations.
+
+      Parameters
+      ----------
+      row: list
+         A list of strings, e.g. ['DUB', 'LHR', 'CDG', 'AMS', 'CPH', 'SIS99']
+         Last element is aircraft. First element is "home" airport. Remaining
+         elements are intermediary airports.
+      """
+      profile = self._profile
+      if profile is not None:
+         started = profile.start()
+
+      self._row = row
+      aircraft_code = self._row[-1]
+      airport_codes = [code for code in self._row[:-1] if code]
+      error = _row_error(self._data, row)
+      if error is not None:
+         print(error + "\nQuitting")
+         sys.exit()
+
+      # check by aircraft code if aircraft in cache; create & add otherwise
+
+      aircraft_cached = aircraft_code in self._aircraft_dict
+      if aircraft_cached:
+         self._aircraft = self._aircraft_dict[aircraft_code]
+      else:
+         self._aircraft = Aircraft(self._data, aircraft_code)
+         self._aircraft_dict[aircraft_code] = self._aircraft
+               
+      # check by airport code if airport in cache; create & add otherwise
+      # add airports to list, index 0 is home airport; rest are destinations
+
+      self._airports = []
+      resolved = 0
+
+      for code in airport_codes:
+         if code not in self._airport_dict:
+            self._airport_dict[code] = Airport(self._data, code)
+            resolved += 1
+         self._airports.append(self._airport_dict[code])
+
+      self._gap = None
+
+      if profile is not None:
+         profile.count('aircraft_cache_hits' if aircraft_cached else 'aircraft_resolved')
+         profile.count('airports_resolved', resolved)
+         profile.count('airport_cache_hits', len(airport_codes) - resolved)
+         profile.stop('airport_resolution', started)
+         started = profile.start()
+
+      self._build_matrices()
+
+      if profile is not None:
+         profile.stop('build_matrices', started)
+         profile.count('rows')
+
+   def _build_matrices(self):
+      """A method that computes, once per loaded row, the distance between each
+      pair of airports, the cost of each directed leg, and whether each leg is
+      within the aircraft's range. Distance is symmetric, so each pair is
+      calculated once; leg cost is not, as fuel is bought at the departure
+      airport. Where the Data instance has a distance store open, distances are
+      read from the store instead of calculated.
+      """
+      n = len(self._airports)
+      rates = [airport._to_euro_rate for airport in self._airports]
+
+      store = self._data._distance_store
+      self._distances = None if store is None else \
+         store.matrix([airport._airport_code for airport in self._airports])
+
+      if self._distances is None:
+         self._distances = [[0.0] * n for _ in range(n)]
+         for i in range(n):
+            for j in range(i+1, n):
+               distance = self._calculate_distance(self._airports[i], self._airports[j])
+               self._distances[i][j] = distance
+               self._distances[j][i] = distance
+
+      self._leg_costs = [[self._distances[i][j] * rates[i] for j in range(n)]
+                         for i in range(n)]
+      self._in_range = [[self._distances[i][j] <= self._aircraft._range
+                         for j in range(n)] for i in range(n)]
+
+      # replace legs out of range by their cheapest path via refuelling stops
+      self._refuel_stops = dict()
+      if not self._refuel:
+         return
+      for i in range(n):
+         targets = [j for j in range(n) if j != i and not self._in_range[i][j]]
+         if not targets:
+            continue
+         paths = self._refuel_paths_from(self._airports[i],
+                                         [self._airports[j] for j in targets])
+         for j, path in zip(targets, paths):
+            if path is None:
+               continue
+            self._leg_costs[i][j], self._distances[i][j], self._refuel_stops[(i, j)] = path
+            self._in_range[i][j] = True
+
+   def _refuel_paths_from(self, origin, destinations):
+      """A method that returns the cheapest way to fly from origin to each of
+      destinations, whose direct legs exceed the aircraft's range, via any
+      airports of airport.csv with a known rate as refuelling stops, as fuel
+      must be costed where it is bought. One Dijkstra search from
+      origin serves every destination, over the graph joining each airport to
+      every airport within the aircraft's range, each hop costed at its
+      departure airport's rate, as legs are. Edges are not precomputed; an
+      airport's neighbours are found from the spatial index as it is
+      expanded, and the search stops once every destination is settled.
+      Returns, for each destination, the cost, the distance flown, and the
+      list of stop codes, or None where it cannot be reached. Paths are kept
+      in _refuel_paths across rows.
+
+      Parameters
+      ----------
+      origin: Airport instance
+         The airport the legs depart from.
+
+      destinations: list
+         Airport instances the legs arrive at.
+      """
+      radius = self._aircraft._range
+      version = self._data._rates_version
+      start = origin._airport_code
+
+      def key(destination):
+         return start, destination._airport_code, radius, version
+
+      wanted = {destination._airport_code for destination in destinations
+                if key(destination) not in self._refuel_paths}
+
+      if wanted:
+         index = self._data.spatial_index(resolved=True)
+         records = self._data._resolved_airports
+
+         costs = {start: 0.0}
+         parents = dict()
+         settled = set()
+         heap = [(0.0, 0.0, start)]
+
+         while heap and wanted:
+            cost, distance, code = heapq.heappop(heap)
+            if code in settled:
+               continue
+            settled.add(code)
+
+            if code in wanted:
+               wanted.discard(code)
+               stops = []
+               stop = parents[code]
+               while stop != start:
+                  stops.append(stop)
+                  stop = parents[stop]
+               stops.reverse()
+               self._refuel_paths[(start, code, radius, version)] = (cost, distance, stops)
+
+            rate = records[code]._to_euro_rate
+            for hop, other in index.within(*index.coordinates(code), radius,
+                                           ordered=False):
+               if other in settled:
+                  continue
+               new_cost = cost + hop * rate
+               if new_cost < costs.get(other, float('inf')):
+                  costs[other] = new_cost
+                  parents[other] = code
+                  heapq.heappush(heap, (new_cost, distance + hop, other))
+
+         for code in wanted:
+            self._refuel_paths[(start, code, radius, version)] = None
+
+      return [self._refuel_paths[key(destination)] for destination in destinations]
+
+   def route_codes(self, best_route):
+      """A method that returns the codes of every airport of a route found for
+      the loaded row, from and back to the home airport, with each refuelling
+      stop's code in parentheses.
+
+      Parameters
+      ----------
+      best_route: tuple
+         The home airport and journey, as returned by solve.
+      """
+      positions = {id(airport): i for i, airport in enumerate(self._airports)}
+      order = [0] + [positions[id(airport)] for airport in best_route[1][:-2]] + [0]
+
+      codes = [self._airports[0]._airport_code]
+      for i, j in zip(order, order[1:]):
+         codes.extend('({0})'.format(stop) for stop in self._refuel_stops.get((i, j), []))
+         codes.append(self._airports[j]._airport_code)
+      return codes
+
+   def route_distance(self, best_route):
+      """A method that returns the distance flown, in km, on a route found for
+      the loaded row, from and back to the home airport, including any
+      refuelling stops.
+
+      Parameters
+      ----------
+      best_route: tuple
+         The home airport and journey, as returned by solve.
+      """
+      positions = {id(airport): i for i, airport in enumerate(self._airports)}
+      order = [0] + [positions[id(airport)] for airport in best_route[1][:-2]] + [0]
+      return sum(self._distances[i][j] for i, j in zip(order, order[1:]))
+
+   def _generate_permutations(self):
+      """A method that returns a lazy iterator over permutations of all
+      airports, excluding the first "home" airport. Permutations are tuples of
+      positions in _airports, so that they index directly into the matrices
+      from _build_matrices. None are held in memory until consumed.
+      """
+
+      return permutations(range(1, len(self._airports)))
+
+   def _cost_journeys(self):
+      """A generator that iterates through the permutations and, for each,
+      looks up the cost of each intermediary journey (i.e. excluding home
+      airport —> first destination, and final destination —> home airport).
+      Then adds the cost of the first leg (home airport —> first destination),
+      and lastly the cost of the last leg (final destination —> home airport).
+      Costs and range checks are read from the matrices built in
+      _build_matrices. Yields the rounded total cost, the flag, which is None
+      if no leg exceeds the aircraft range and False otherwise, and the
+      permutation of positions.
+      """
+
+      leg_costs = self._leg_costs
+      in_range = self._in_range
+
+      for journey in self._generate_permutations():
+         flag = None
+         cost = 0
+
+         # tally cost for all except outset & ending journeys
+         for i in range(len(journey)-1):
+            if not in_range[journey[i]][journey[i+1]]:
+               flag = False
+            cost += leg_costs[journey[i]][journey[i+1]]
+
+         # add cost for the first leg of the journey
+         if not in_range[0][journey[0]]:
+            flag = False
+         cost += leg_costs[0][journey[0]]
+
+         # add cost for the final leg of journey
+         if not in_range[journey[-1]][0]:
+            flag = False
+         cost += leg_costs[journey[-1]][0]
+
+         yield round(cost, 2), flag, journey
+
+   def add_cost_add_flag(self):
+      """A method that costs every permutation through _cost_journeys and
+      collects them all in the _permutations list. Each permutation of
+      positions is replaced by the list of its Airport instances, to which the
+      total cost of the round trip is appended. If no leg of round trip exceeds
+      the aircraft range, None is appended to the list. If a leg does exceed
+      the range, False is appended in place of None. Holds every permutation
+      in memory; solve uses _stream_cheapest_routes instead.
+      """
+
+      journeys = self._cost_journeys()
+      if self._profile is not None:
+         journeys = self._counted(journeys)
+      self._permutations = [[self._airports[i] for i in journey] + [cost, flag]
+                            for cost, flag, journey in journeys]
+
+   def _counted(self, journeys):
+      """A generator that passes on the costed journeys of _cost_journeys,
+      counting those evaluated and those rejected for range into _profile once
+      they are exhausted. Used only where profiling, so that the loop over
+      permutations is otherwise untouched.
+
+      Parameters
+      ----------
+      journeys: iterable
+         Tuples of cost, flag, and permutation, as yielded by _cost_journeys.
+      """
+      evaluated = rejected = 0
+      for journey in journeys:
+         evaluated += 1
+         if journey[1] is not None:
+            rejected += 1
+         yield journey
+      self._profile.count('permutations_evaluated', evaluated)
+      self._profile.count('permutations_out_of_range', rejected)
+
+   def return_cheapest_route(self):
+      """A method that finds the lowest-price valid journey in one pass through
+      the permuted routes, keeping the first of equal price. Returns the home
+      airport, and the lowest-price journey, or None where no journey is
+      valid.
+      """
+      cheapest = None
 
       for journey in self._permutations:
-         if not journey[-1] == False:
-            if journey[-2] < lowest_price:
-               lowest_price = journey[-2]
-      
-      for journey in self._permutations:
-         if journey[-2] != lowest_price:
+         if journey[-1] is None:
+            if cheapest is None or journey[-2] < cheapest[-2]:
+               cheapest = journey
+
+      if cheapest is None:
+         return None
+      return self._airports[0], cheapest
+
+   def _stream_cheapest_routes(self, k=1):
+      """A method that consumes _cost_journeys lazily, keeping only the k
+      cheapest valid journeys seen so far in a bounded heap, or only the
+      running best where k is 1. Memory is constant in the number of
+      permutations. Journeys of equal cost are kept in permutation order, so
+      the cheapest is the one return_cheapest_route would give. Returns a list,
+      cheapest first, of the home airport and journey, in the form returned by
+      return_cheapest_route.
+
+      Parameters
+      ----------
+      k: int
+         The number of cheapest journeys to return.
+      """
+      journeys = self._cost_journeys()
+      if self._profile is not None:
+         journeys = self._counted(journeys)
+      valid = ((cost, journey) for cost, flag, journey in journeys
+               if flag is None)
+
+      return [(self._airports[0], [self._airports[i] for i in journey] + [cost, None])
+              for cost, journey in heapq.nsmallest(k, valid, key=itemgetter(0))]
+
+   def _stream_pareto_routes(self):
+      """A method that consumes _cost_journeys lazily, adding each valid
+      journey, with its distance, to a ParetoFront, so that only the
+      journeys on the front are held. Returns the journeys on the cost/
+      distance front, as _front_routes does.
+      """
+      distances = self._distances
+      front = ParetoFront()
+
+      for cost, flag, journey in self._cost_journeys():
+         if flag is not None:
+            continue
+         distance = 0
+         for i in range(len(journey)-1):
+            distance += distances[journey[i]][journey[i+1]]
+         distance += distances[0][journey[0]]
+         distance += distances[journey[-1]][0]
+         front.add(cost, round(distance, 3), journey)
+
+      return self._front_routes(front)
+
+   def _front_routes(self, front):
+      """A method that returns a list, cheapest first, of the home airport and
+      journey, in the form returned by return_cheapest_route, of each route
+      on front, whose routes are permutations of positions.
+
+      Parameters
+      ----------
+      front: ParetoFront instance
+         The front, of permutations of positions in _airports.
+      """
+      return [(self._airports[0], [self._airports[i] for i in order] + [round(cost, 2), None])
+              for cost, _, order in front.routes()]
+
+   def _bounded_routes(self, k=None, incumbent=None):
+      """A method that finds, by branch and bound, either the k cheapest valid
+      round-trips or, where k is None, the cost/distance front of the valid
+      round-trips. Branches are explored as in _branch_and_bound, and a branch
+      is pruned where a lower bound on the cost of its routes is no better
+      than the kth cheapest route found; or, for the front, where lower
+      bounds on both cost and distance are dominated by a route found. The
+      distance bound, like the cost bound, sums the shortest in-range leg
+      departing each airport still to be departed. As the search is not
+      bounded by the row's size, it stops once _time_budget is spent, where
+      set, keeping the routes found so far and setting _search_stopped. An
+      incumbent is recorded before the search starts, so that it bounds the
+      search from the first branch, and is among the routes returned however
+      soon the search stops. Returns a list, cheapest first, of the home
+      airport and journey, in the form returned by return_cheapest_route.
+
+      Parameters
+      ----------
+      k: int
+         The number of cheapest journeys to find, or None for the front.
+
+      incumbent: list
+         Positions of the destinations of a valid round-trip, in order, e.g.
+         of the route found by solve; or None.
+      """
+      n = len(self._airports)
+      infinity = float('inf')
+      leg_costs = self._leg_costs
+      distances = self._distances
+      in_range = self._in_range
+
+      min_cost = [min([leg_costs[i][j] for j in range(n) if j != i and in_range[i][j]],
+                      default=infinity) for i in range(n)]
+      min_distance = [min([distances[i][j] for j in range(n) if j != i and in_range[i][j]],
+                          default=infinity) for i in range(n)]
+      if infinity in min_cost:
+         return []
+
+      deadline = None
+      if self._time_budget is not None:
+         deadline = time.perf_counter() + self._time_budget
+
+      # the k cheapest so far, dearest first, as (-cost, -number, order)
+      heap = []
+      front = ParetoFront()
+      found = [0]
+      stopped = [False]
+
+      def record(cost, distance, order):
+         if k is not None and order == incumbent and found[0]:
+            return
+         found[0] += 1
+         if k is None:
+            front.add(round(cost, 2), round(distance, 3), order)
+         elif len(heap) < k:
+            heapq.heappush(heap, (-cost, -found[0], order))
+         elif cost < -heap[0][0]:
+            heapq.heapreplace(heap, (-cost, -found[0], order))
+
+      def pruned(cost, distance):
+         if k is None:
+            return front.dominated(cost, distance)
+         return len(heap) == k and cost >= -heap[0][0]
+
+      def extend(current, order, unvisited, cost, distance, cost_bound, distance_bound):
+         if stopped[0] or (deadline is not None and time.perf_counter() > deadline):
+            stopped[0] = True
+            return
+         if not unvisited:
+            if in_range[current][0]:
+               record(cost + leg_costs[current][0],
+                      distance + distances[current][0], list(order))
+            return
+
+         for j in sorted(unvisited, key=lambda j: (leg_costs[current][j], j)):
+            if not in_range[current][j]:
+               continue
+            next_cost = cost + leg_costs[current][j]
+            next_distance = distance + distances[current][j]
+            if pruned(next_cost + cost_bound, next_distance + distance_bound):
+               continue
+            order.append(j)
+            unvisited.remove(j)
+            extend(j, order, unvisited, next_cost, next_distance,
+                   cost_bound - min_cost[j], distance_bound - min_distance[j])
+            unvisited.add(j)
+            order.pop()
+
+      if incumbent is not None:
+         tour = [0] + incumbent + [0]
+         record(self._tour_cost(tour),
+                sum(distances[i][j] for i, j in zip(tour, tour[1:])), incumbent)
+
+      extend(0, [], set(range(1, n)), 0, 0, sum(min_cost[1:]), sum(min_distance[1:]))
+      self._search_stopped = stopped[0]
+
+      if k is None:
+         return self._front_routes(front)
+      return [(self._airports[0], [self._airports[i] for i in order] + [round(-cost, 2), None])
+              for cost, _, order in sorted(heap, reverse=True)]
+
+   def _route_positions(self, best_route):
+      """A method that returns the positions in _airports of the destinations
+      of a route for the loaded row, in order, or None where best_route is.
+
+      Parameters
+      ----------
+      best_route: tuple
+         The home airport and journey, as returned by solve; or None.
+      """
+      if best_route is None:
+         return None
+      positions = {airport._airport_code: i for i, airport in enumerate(self._airports)}
+      return [positions[airport._airport_code] for airport in best_route[1][:-2]]
+
+   def top_routes(self, k, best_route=None):
+      """A method that returns the k cheapest valid round-trips for the loaded
+      row, cheapest first, as a list of the home airport and journey, in the
+      form returned by return_cheapest_route; fewer where fewer are valid.
+      Found in a single pass with a bounded heap: over the permutations where
+      the row's solver enumerates them, over NumPy blocks with the
+      'vectorised' solver, and otherwise by branch and bound, as Held-Karp
+      and the heuristic keep only the best route. Branch and bound stops at
+      _time_budget, setting _search_stopped, so that the routes returned may
+      then not be the cheapest; it starts from best_route, where given, so
+      that the route solve found is always among them.
+
+      Parameters
+      ----------
+      k: int
+         The number of cheapest journeys to return.
+
+      best_route: tuple
+         The route returned by solve for the loaded row, or None.
+      """
+      self._search_stopped = False
+      solver = self._row_solver()
+      if solver == 'permutations':
+         return self._stream_cheapest_routes(k)
+      if solver == 'vectorised':
+         return self._vectorised_top(k)
+      return self._bounded_routes(k, self._route_positions(best_route))
+
+   def pareto_routes(self, best_route=None):
+      """A method that returns the valid round-trips for the loaded row on the
+      trade-off between cost and distance flown, those that no other route
+      beats on both, cheapest first, as a list of the home airport and
+      journey, in the form returned by return_cheapest_route. Found in a
+      single pass, with a ParetoFront, by the same solvers as top_routes, and
+      likewise stopped at _time_budget by branch and bound, starting from
+      best_route where given.
+
+      Parameters
+      ----------
+      best_route: tuple
+         The route returned by solve for the loaded row, or None.
+      """
+      self._search_stopped = False
+      solver = self._row_solver()
+      if solver == 'permutations':
+         return self._stream_pareto_routes()
+      if solver == 'vectorised':
+         return self._vectorised_pareto()
+      return self._bounded_routes(incumbent=self._route_positions(best_route))
+
+   def _held_karp(self, incumbent=None):
+      """A method that finds the cheapest valid round-trip by the Held-Karp
+      dynamic programming algorithm. For each subset of destinations, encoded
+      as a bitmask, and each destination in that subset, it records the
+      cheapest cost of leaving home, visiting exactly that subset, and ending
+      at that destination. Legs exceeding the aircraft's range are never
+      taken, and each leg is costed at its departure airport's rate, as in
+      add_cost_add_flag. Returns the home airport and the cheapest journey in
+      the same form as return_cheapest_route, or None where no valid
+      round-trip exists.
+
+      Given an incumbent, no state is kept whose cost so far plus a lower
+      bound on the rest, as in _branch_and_bound, exceeds the incumbent's
+      cost; such a state cannot lie on a route cheaper than the incumbent, so
+      the route found is unchanged.
+
+      Parameters
+      ----------
+      incumbent: list
+         Positions of the destinations of a valid round-trip, in order, whose
+         cost bounds the states kept; or None.
+      """
+      leg_costs = self._leg_costs
+      in_range = self._in_range
+      destinations = len(self._airports) - 1
+      full = (1 << destinations) - 1
+      infinity = float('inf')
+
+      bound = infinity
+      if incumbent is not None:
+         bound = self._tour_cost([0] + incumbent + [0])
+      if bound < infinity:
+         min_out = [min([leg_costs[i][j] for j in range(destinations + 1)
+                         if j != i and in_range[i][j]])
+                    for i in range(destinations + 1)]
+         # sum of min_out over the destinations not in each mask
+         rest = [0.0] * (full + 1)
+         for mask in range(full - 1, -1, -1):
+            low = ~mask & (mask + 1)
+            rest[mask] = rest[mask | low] + min_out[low.bit_length()]
+         # allow for rounding in the sums
+         bound += 1e-6
+
+      # bit j-1 of a mask stands for the airport at position j in _airports
+      cost = [[infinity] * (destinations + 1) for _ in range(full + 1)]
+      parent = [[0] * (destinations + 1) for _ in range(full + 1)]
+
+      for j in range(1, destinations + 1):
+         if in_range[0][j]:
+            cost[1 << (j-1)][j] = leg_costs[0][j]
+
+      for mask in range(1, full + 1):
+         row = cost[mask]
+         for j in range(1, destinations + 1):
+            if row[j] == infinity:
+               continue
+            for k in range(1, destinations + 1):
+               bit = 1 << (k-1)
+               if mask & bit or not in_range[j][k]:
+                  continue
+               candidate = row[j] + leg_costs[j][k]
+               if candidate < cost[mask | bit][k]:
+                  if bound < infinity and \
+                     candidate + min_out[k] + rest[mask | bit] > bound:
+                     continue
+                  cost[mask | bit][k] = candidate
+                  parent[mask | bit][k] = j
+
+      best_cost = infinity
+      last = 0
+      for j in range(1, destinations + 1):
+         if in_range[j][0] and cost[full][j] + leg_costs[j][0] < best_cost:
+            best_cost = cost[full][j] + leg_costs[j][0]
+            last = j
+
+      if best_cost == infinity:
+         return None
+
+      # walk the parent table back from the last destination
+      order = []
+      mask = full
+      while last:
+         order.append(last)
+         mask, last = mask & ~(1 << (last-1)), parent[mask][last]
+      order.reverse()
+
+      journey = [self._airports[i] for i in order]
+      journey.append(round(best_cost, 2))
+      journey.append(None)
+      return self._airports[0], journey
+
+   def _branch_and_bound(self, incumbent=None):
+      """A method that finds the cheapest valid round-trip by branch and bound.
+      Partial routes are extended depth-first from the home airport, cheapest
+      next leg first. A branch is pruned as soon as a leg exceeds the
+      aircraft's range, or when its cost so far plus a lower bound on the rest
+      is no better than the cheapest complete route found. The bound is the
+      sum, over the current airport and every unvisited destination, of that
+      airport's cheapest in-range outgoing leg, since each must be departed
+      once more. Returns the home airport and the cheapest journey in the
+      same form as return_cheapest_route, or None where no valid round-trip
+      exists. Counts are left in _nodes_explored and _nodes_pruned.
+
+      Parameters
+      ----------
+      incumbent: list
+         Positions of the destinations of a valid round-trip, in order, whose
+         cost bounds the search from the start; or None.
+      """
+      n = len(self._airports)
+      infinity = float('inf')
+
+      self._nodes_explored = 0
+      self._nodes_pruned = 0
+      self._best_cost = infinity
+      self._best_order = None
+
+      if incumbent is not None:
+         cost = self._tour_cost([0] + incumbent + [0])
+         if cost < infinity:
+            self._best_cost = cost
+            self._best_order = list(incumbent)
+
+      self._min_out = [min([self._leg_costs[i][j] for j in range(n)
+                            if j != i and self._in_range[i][j]], default=infinity)
+                       for i in range(n)]
+
+      # an airport with no in-range departure can never be left
+      if infinity not in self._min_out:
+         self._extend(0, [], set(range(1, n)), 0, sum(self._min_out[1:]))
+
+      if self._best_order is None:
+         return None
+
+      journey = [self._airports[i] for i in self._best_order]
+      journey.append(round(self._best_cost, 2))
+      journey.append(None)
+      return self._airports[0], journey
+
+   def _extend(self, current, order, unvisited, partial, remaining_bound):
+      """Recursive step of _branch_and_bound. Extends the partial route ending at
+      current by each unvisited destination, or closes the route back to the
+      home airport once all destinations are visited.
+
+      Parameters
+      ----------
+      current: int
+         Position in _airports of the last airport of the partial route.
+
+      order: list
+         Positions of the destinations visited so far, in order.
+
+      unvisited: set
+         Positions of the destinations not yet visited.
+
+      partial: float
+         Cost of the partial route so far.
+
+      remaining_bound: float
+         Sum of _min_out over the unvisited destinations.
+      """
+      self._nodes_explored += 1
+
+      if not unvisited:
+         if self._in_range[current][0]:
+            total = partial + self._leg_costs[current][0]
+            if total < self._best_cost:
+               self._best_cost = total
+               self._best_order = list(order)
+         else:
+            self._nodes_pruned += 1
+         return
+
+      leg_costs = self._leg_costs[current]
+      for k in sorted(unvisited, key=lambda k: (leg_costs[k], k)):
+         if not self._in_range[current][k]:
+            self._nodes_pruned += 1
+            continue
+
+         cost = partial + leg_costs[k]
+         rest = remaining_bound - self._min_out[k]
+         if cost + self._min_out[k] + rest >= self._best_cost:
+            self._nodes_pruned += 1
+            continue
+
+         order.append(k)
+         unvisited.remove(k)
+         self._extend(k, order, unvisited, cost, rest)
+         unvisited.add(k)
+         order.pop()
+
+   def _vectorised_blocks(self, with_distances=False):
+      """A generator that costs every permutation, as _cost_journeys does, but
+      a block of permutations at a time with NumPy. Each block is an integer
+      array of routes, one row per permutation, beginning and ending with the
+      home airport's position; leg costs and range checks are gathered from
+      the row's matrices by fancy indexing. Blocks are formed by fixing a
+      prefix of destinations and appending every ordering of the rest, which
+      keeps permutations in the same order as itertools. Legs are added in the
+      same order as _cost_journeys, giving identical costs. A block holds at
+      most _chunk_size permutations. Yields, per block, the number of the
+      block's first permutation, the block, the exact costs, and the rounded
+      costs, infinite where a leg is out of range; and, where with_distances,
+      the distance of each route. The block array is reused, so rows to be
+      kept must be copied.
+
+      Parameters
+      ----------
+      with_distances: bool
+         Whether to yield the distance of each route as well.
+      """
+      n = len(self._airports)
+      destinations = n - 1
+      leg_costs = np.array(self._leg_costs)
+      in_range = np.array(self._in_range)
+      distances = np.array(self._distances)
+
+      # longest suffix whose orderings fit in one block
+      suffix = 1
+      while suffix < destinations and factorial(suffix + 1) <= self._chunk_size:
+         suffix += 1
+      prefix = destinations - suffix
+      suffix_orders = np.array(list(permutations(range(suffix))), dtype=np.intp)
+
+      # first and last columns stay 0, the home airport's position
+      block = np.zeros((len(suffix_orders), n + 1), dtype=np.intp)
+      first = 0
+
+      for head in permutations(range(1, n), prefix):
+         rest = np.array(sorted(set(range(1, n)) - set(head)), dtype=np.intp)
+         block[:, 1:prefix+1] = head
+         block[:, prefix+1:n] = rest[suffix_orders]
+
+         # tally cost for all except outset & ending journeys, then add them
+         cost = np.zeros(len(block))
+         for i in range(1, destinations):
+            cost += leg_costs[block[:, i], block[:, i+1]]
+         cost += leg_costs[0, block[:, 1]]
+         cost += leg_costs[block[:, destinations], 0]
+
+         rounded = np.round(cost, 2)
+         out_of_range = ~in_range[block[:, :-1], block[:, 1:]].all(axis=1)
+         rounded[out_of_range] = np.inf
+         if self._profile is not None:
+            self._profile.count('permutations_evaluated', len(block))
+            self._profile.count('permutations_out_of_range', int(out_of_range.sum()))
+
+         if with_distances:
+            distance = distances[block[:, :-1], block[:, 1:]].sum(axis=1)
+            yield first, block, cost, rounded, distance
+         else:
+            yield first, block, cost, rounded
+         first += len(block)
+
+   def _vectorised(self):
+      """A method that finds the cheapest valid round-trip from the blocks of
+      _vectorised_blocks. Ties are settled by permutation order, as in
+      return_cheapest_route. Returns the home airport and the cheapest journey
+      in the same form as return_cheapest_route, or None where no valid
+      round-trip exists.
+      """
+      n = len(self._airports)
+      best_cost = float('inf')
+      best_order = None
+
+      for _, block, cost, rounded in self._vectorised_blocks():
+         i = int(np.argmin(rounded))
+         if rounded[i] < best_cost:
+            best_cost = rounded[i]
+            best_order = block[i, 1:n].tolist()
+            best_exact = float(cost[i])
+
+      if best_order is None:
+         return None
+
+      journey = [self._airports[i] for i in best_order]
+      journey.append(round(best_exact, 2))
+      journey.append(None)
+      return self._airports[0], journey
+
+   def _vectorised_top(self, k):
+      """A method that returns the k cheapest valid round-trips, as
+      _stream_cheapest_routes does, from the blocks of _vectorised_blocks.
+      Only the candidates of each block that could be among the k cheapest,
+      those costing no more than the block's kth cheapest, leave NumPy, to a
+      bounded heap ordered by cost then permutation number, so ties are
+      settled as in _stream_cheapest_routes.
+
+      Parameters
+      ----------
+      k: int
+         The number of cheapest journeys to return.
+      """
+      n = len(self._airports)
+      heap = []
+
+      for first, block, _, rounded in self._vectorised_blocks():
+         if len(block) > k:
+            kth = np.partition(rounded, k - 1)[k - 1]
+            candidates = np.flatnonzero(rounded <= kth)
+         else:
+            candidates = np.arange(len(block))
+
+         for i in candidates.tolist():
+            if rounded[i] == np.inf:
+               continue
+            entry = (-float(rounded[i]), -(first + i))
+            if len(heap) < k:
+               heapq.heappush(heap, entry + (block[i, 1:n].tolist(),))
+            elif entry > heap[0][:2]:
+               heapq.heapreplace(heap, entry + (block[i, 1:n].tolist(),))
+
+      return [(self._airports[0], [self._airports[i] for i in order] + [-cost, None])
+              for cost, _, order in sorted(heap, reverse=True)]
+
+   def _vectorised_pareto(self):
+      """A method that returns the cost/distance front of the valid
+      round-trips, as _stream_pareto_routes does, from the blocks of
+      _vectorised_blocks. Each block's own front is found in NumPy, by
+      ordering its routes by cost then distance and keeping those shorter
+      than every cheaper one; only those are added to the ParetoFront.
+      """
+      n = len(self._airports)
+      front = ParetoFront()
+
+      for first, block, _, rounded, distance in self._vectorised_blocks(True):
+         valid = np.flatnonzero(rounded != np.inf)
+         if not len(valid):
+            continue
+         ranked = valid[np.lexsort((valid, distance[valid], rounded[valid]))]
+         shortest = np.minimum.accumulate(distance[ranked])
+         keep = np.ones(len(ranked), dtype=bool)
+         keep[1:] = distance[ranked][1:] < shortest[:-1]
+
+         for i in ranked[keep].tolist():
+            front.add(float(rounded[i]), round(float(distance[i]), 3),
+                      block[i, 1:n].tolist())
+
+      return self._front_routes(front)
+
+   def _tour_cost(self, tour):
+      """A method that returns the cost of a round-trip, given as a list of
+      positions in _airports beginning and ending with 0, the home airport, or
+      infinity where any leg is out of range.
+
+      Parameters
+      ----------
+      tour: list
+         Positions of the airports of the round-trip, in order.
+      """
+      cost = 0
+      for i, j in zip(tour, tour[1:]):
+         if not self._in_range[i][j]:
+            return float('inf')
+         cost += self._leg_costs[i][j]
+      return cost
+
+   def _nearest_neighbour_tour(self, deadline):
+      """A method that returns a valid round-trip built by always flying the
+      cheapest in-range leg to an unvisited destination, backtracking where
+      that leads to a dead end, or None where none is found by deadline or
+      within _backtrack_limit dead ends. Where any airport has no in-range leg
+      out or in, no round-trip exists, and None is returned at once.
+
+      Parameters
+      ----------
+      deadline: float
+         time.perf_counter() value by which to give up, or None.
+      """
+      n = len(self._airports)
+      for i in range(n):
+         if not any(self._in_range[i][j] for j in range(n) if j != i) or \
+            not any(self._in_range[j][i] for j in range(n) if j != i):
+            return None
+
+      tour = [0]
+      unvisited = set(range(1, n))
+      dead_ends = 0
+      # per depth, the candidates not yet tried, cheapest last
+      choices = [sorted(unvisited, key=lambda k: -self._leg_costs[0][k])]
+
+      while choices:
+         if deadline is not None and time.perf_counter() > deadline:
+            return None
+         if not unvisited:
+            if self._in_range[tour[-1]][0]:
+               return tour + [0]
+         elif choices[-1]:
+            k = choices[-1].pop()
+            if self._in_range[tour[-1]][k]:
+               tour.append(k)
+               unvisited.remove(k)
+               choices.append(sorted(unvisited, key=lambda j: -self._leg_costs[k][j]))
+               continue
+            continue
+
+         # dead end: step back
+         dead_ends += 1
+         if dead_ends > Router._backtrack_limit:
+            return None
+         choices.pop()
+         if len(tour) > 1:
+            unvisited.add(tour.pop())
+      return None
+
+   def _local_search(self, tour, cost, deadline):
+      """A method that improves a valid round-trip by first-improvement local
+      search until no move helps or the deadline passes. Moves are 2-opt,
+      reversing a run of destinations, and Or-opt, moving a run of up to 3
+      destinations elsewhere in the route. As fuel is priced at the departure
+      airport, leg costs are asymmetric, so each candidate is costed in full.
+      Returns the improved round-trip and its cost.
+
+      Parameters
+      ----------
+      tour: list
+         Positions of the airports of the round-trip, in order.
+
+      cost: float
+         The cost of tour.
+
+      deadline: float
+         time.perf_counter() value by which to stop, or None.
+      """
+      last = len(tour) - 1
+      improved = True
+      while improved:
+         improved = False
+
+         for i in range(1, last - 1):
+            for j in range(i + 1, last):
+               candidate = tour[:i] + tour[j:i-1:-1] + tour[j+1:]
+               candidate_cost = self._tour_cost(candidate)
+               if candidate_cost < cost:
+                  tour, cost, improved = candidate, candidate_cost, True
+
+         for length in (1, 2, 3):
+            for i in range(1, last - length + 1):
+               segment = tour[i:i+length]
+               rest = tour[:i] + tour[i+length:]
+               for p in range(1, len(rest)):
+                  if p == i:
+                     continue
+                  candidate = rest[:p] + segment + rest[p:]
+                  candidate_cost = self._tour_cost(candidate)
+                  if candidate_cost < cost:
+                     tour, cost, improved = candidate, candidate_cost, True
+                     break
+
+         if deadline is not None and time.perf_counter() > deadline:
+            break
+      return tour, cost
+
+   def _heuristic(self, incumbent=None):
+      """A method that finds a cheap valid round-trip for rows with too many
+      destinations to solve exactly. A first route is built by nearest
+      neighbour, then improved by local search; once no move helps, the best
+      route is perturbed by a double-bridge move, exchanging two runs of
+      destinations, and searched again, keeping whichever is cheaper. Stops
+      when _time_budget or _iteration_budget is spent, and returns the best
+      route found so far, so it may be stopped at any time. Randomness is
+      seeded, so that runs repeat. Where _report_gap is set and the row has
+      at most _gap_limit destinations, _gap is set from Held-Karp's optimum,
+      found after the budget is spent. Returns the home airport and the
+      journey in the same form as return_cheapest_route, or None where no
+      valid round-trip is found.
+
+      Parameters
+      ----------
+      incumbent: list
+         Positions of the destinations of a valid round-trip, in order, from
+         which to search in place of the nearest neighbour route; or None.
+      """
+      deadline = None
+      if self._time_budget is not None:
+         deadline = time.perf_counter() + self._time_budget
+      generator = random.Random(0)
+      self._gap = None
+
+      best = None
+      if incumbent is not None:
+         best = [0] + incumbent + [0]
+         if self._tour_cost(best) == float('inf'):
+            best = None
+      if best is None:
+         best = self._nearest_neighbour_tour(deadline)
+      if best is None:
+         return None
+      best, best_cost = self._local_search(best, self._tour_cost(best), deadline)
+
+      destinations = len(best) - 2
+      iteration = 0
+      while destinations >= 4:
+         if deadline is not None and time.perf_counter() > deadline:
+            break
+         if self._iteration_budget is not None and iteration >= self._iteration_budget:
+            break
+         iteration += 1
+
+         a, b, c = sorted(generator.sample(range(2, destinations + 1), 3))
+         kicked = best[:a] + best[c:-1] + best[b:c] + best[a:b] + [0]
+         kicked_cost = self._tour_cost(kicked)
+         if kicked_cost == float('inf'):
+            continue
+         kicked, kicked_cost = self._local_search(kicked, kicked_cost, deadline)
+         if kicked_cost < best_cost:
+            best, best_cost = kicked, kicked_cost
+
+      if self._report_gap and destinations <= Router._gap_limit:
+         optimum = self._held_karp()
+         if optimum is not None and optimum[1][-2]:
+            self._gap = (round(best_cost, 2) - optimum[1][-2]) / optimum[1][-2]
+
+      journey = [self._airports[i] for i in best[1:-1]]
+      journey.append(round(best_cost, 2))
+      journey.append(None)
+      return self._airports[0], journey
+
+   def compare_fleet(self, airport_codes, aircraft_codes=None):
+      """A method that finds, for one set of airports, the cheapest valid
+      round-trip for each of several aircraft. Leg costs do not depend on the
+      aircraft, only which legs are in range, so the row is loaded once. Where
+      the row is short enough to enumerate, permutations are costed once, in a
+      single pass that keeps, for each longest leg, the cheapest route with
+      that longest leg; an aircraft can fly a route just where its range
+      covers the longest leg, so each aircraft's route is read from those.
+      Beyond that, aircraft are grouped by the legs their ranges cover, and
+      each group is solved once. With refuelling, costs differ by aircraft, so
+      each aircraft is solved in turn. Returns a list, shortest range first,
+      of the aircraft code, its range, and the route in the form returned by
+      solve, or None where the aircraft cannot fly the round-trip.
+
+      Parameters
+      ----------
+      airport_codes: list
+         The home airport code, then the destination codes.
+
+      aircraft_codes: list
+         The aircraft codes to compare, or None for every aircraft in the
+         data.
+      """
+      if aircraft_codes is None:
+         aircraft_codes = sorted(self._data._aircraft_index)
+
+      fleet = []
+      for code in aircraft_codes:
+         if code not in self._aircraft_dict:
+            self._aircraft_dict[code] = Aircraft(self._data, code)
+         fleet.append((self._aircraft_dict[code]._range, code))
+      fleet.sort()
+
+      if self._refuel:
+         routes = []
+         for aircraft_range, code in fleet:
+            self.load_row(list(airport_codes) + [code])
+            routes.append((code, aircraft_range, self._solve_uncached()))
+         return routes
+
+      self.load_row(list(airport_codes) + [fleet[-1][1]])
+      n = len(self._airports)
+
+      if n - 1 <= Router._enumeration_limit:
+         return self._compare_fleet_single_pass(fleet)
+
+      # aircraft whose ranges cover the same legs share a route
+      legs = sorted(set(self._distances[i][j] for i in range(n)
+                        for j in range(i+1, n)))
+      routes = []
+      solved = dict()
+      for aircraft_range, code in fleet:
+         covered = bisect.bisect_right(legs, aircraft_range)
+         if covered not in solved:
+            self._in_range = [[self._distances[i][j] <= aircraft_range
+                               for j in range(n)] for i in range(n)]
+            solved[covered] = self._solve_uncached() if covered else None
+         routes.append((code, aircraft_range, solved[covered]))
+      return routes
+
+   def _compare_fleet_single_pass(self, fleet):
+      """A method that returns the routes of compare_fleet for the loaded row
+      by costing every permutation once. Legs are added in the same order as
+      _cost_journeys, so costs are identical, and equal costs are settled by
+      permutation order, as in return_cheapest_route.
+
+      Parameters
+      ----------
+      fleet: list
+         Tuples of aircraft range and code, shortest range first.
+      """
+      distances = self._distances
+      leg_costs = self._leg_costs
+
+      # longest leg -> (cost, permutation number, permutation)
+      best = dict()
+      for number, journey in enumerate(self._generate_permutations()):
+         cost = 0
+         longest = max(distances[0][journey[0]], distances[journey[-1]][0])
+
+         for i in range(len(journey)-1):
+            cost += leg_costs[journey[i]][journey[i+1]]
+            if distances[journey[i]][journey[i+1]] > longest:
+               longest = distances[journey[i]][journey[i+1]]
+         cost += leg_costs[0][journey[0]]
+         cost += leg_costs[journey[-1]][0]
+
+         candidate = (round(cost, 2), number, journey)
+         if longest not in best or candidate < best[longest]:
+            best[longest] = candidate
+
+      # cheapest route whose longest leg is at most each longest leg
+      steps = []
+      cheapest = None
+      for longest in sorted(best):
+         if cheapest is None or best[longest] < cheapest:
+            cheapest = best[longest]
+         steps.append((longest, cheapest))
+
+      routes = []
+      step = -1
+      for aircraft_range, code in fleet:
+         while step + 1 < len(steps) and steps[step+1][0] <= aircraft_range:
+            step += 1
+         if step < 0:
+            routes.append((code, aircraft_range, None))
+            continue
+         cost, _, journey = steps[step][1]
+         routes.append((code, aircraft_range, (self._airports[0],
+                        [self._airports[i] for i in journey] + [cost, None])))
+      return routes
+
+   def split_routes(self, airport_codes, aircraft_codes, workers=1,
+                    every_aircraft=True, max_stops=None):
+      """A method that assigns the destinations of one set of airports among
+      several aircraft, each flying its own round-trip from the home airport,
+      so as to minimise the total cost, and orders each round-trip. The row is
+      loaded once, and its leg costs and distances are shared by every
+      aircraft, which differ only in which legs are in range. For each
+      distinct range, the cheapest round-trip over every subset of the
+      destinations is found at once by Held-Karp, in _subset_tour_costs.
+      Every assignment of subsets to aircraft is then weighed by dynamic
+      programming over subsets, in _cover_masks. Both run in parallel across
+      workers processes, which are each handed the shared matrices once.
+      By default every aircraft flies at least one destination, so that
+      there must be at least as many destinations as aircraft; where
+      every_aircraft is False, an aircraft may be left idle where that is
+      cheaper. Where max_stops is given, no aircraft flies more than that
+      many destinations. Returns the total cost and a list, in the order
+      given, of each aircraft's code, and its route's airport codes and cost,
+      or None where it is idle; or None where the aircraft cannot fly every
+      destination between them within these limits.
+
+      Parameters
+      ----------
+      airport_codes: list
+         The home airport code, then the destination codes.
+
+      aircraft_codes: list
+         The codes of the aircraft to split the destinations among, which
+         may repeat.
+
+      workers: int
+         The number of processes to weigh the assignments in.
+
+      every_aircraft: bool
+         Whether every aircraft must fly at least one destination.
+
+      max_stops: int
+         The most destinations any one aircraft may fly, or None for no cap.
+      """
+      if self._refuel:
+         print("Splitting Does Not Support Refuelling Stops.\nQuitting")
+         sys.exit()
+      if len(airport_codes) - 1 > Router._split_limit:
+         print("Splitting Is Limited to {0} Destinations.\nQuitting".format(
+               Router._split_limit))
+         sys.exit()
+
+      fleet = []
+      for code in aircraft_codes:
+         if code not in self._aircraft_dict:
+            self._aircraft_dict[code] = Aircraft(self._data, code)
+         fleet.append(self._aircraft_dict[code])
+
+      longest = max(fleet, key=lambda aircraft: aircraft._range)
+      self.load_row(list(airport_codes) + [longest._aircraft_code])
+      matrices = (self._leg_costs, self._distances)
+      ranges = sorted(set(aircraft._range for aircraft in fleet))
+      full = (1 << (len(self._airports) - 1)) - 1
+
+      pool = None
+      if workers > 1:
+         pool = multiprocessing.Pool(workers, _init_split, matrices)
+      else:
+         _init_split(*matrices)
+      mapper = map if pool is None else pool.map
+      # masks are interleaved across tasks, as larger subsets take longer
+      parts = 1 if pool is None else workers * 4
+
+      try:
+         tables = dict(zip(ranges, mapper(_subset_tour_costs, ranges)))
+         if max_stops is not None:
+            for tours in tables.values():
+               for mask in range(1, full + 1):
+                  if bin(mask).count('1') > max_stops:
+                     tours[mask] = float('inf')
+
+         # cheapest cost of covering each subset with the aircraft so far,
+         # and the subset each aircraft takes in the cheapest such cover
+         best = [0.0] + [float('inf')] * full
+         picks = []
+         for aircraft in fleet:
+            tours = tables[aircraft._range]
+            # covering no destinations leaves the aircraft idle
+            cover = [float('inf') if every_aircraft else 0.0] * (full + 1)
+            pick = [0] * (full + 1)
+            tasks = [(tours, best, not every_aircraft, 1 + part, parts)
+                     for part in range(parts)]
+            for part, (covers, subsets) in enumerate(mapper(_cover_masks, tasks)):
+               cover[1 + part::parts] = covers
+               pick[1 + part::parts] = subsets
+            best = cover
+            picks.append(pick)
+      finally:
+         if pool is not None:
+            pool.terminate()
+
+      if best[full] == float('inf'):
+         return None
+
+      subsets = []
+      mask = full
+      for pick in reversed(picks):
+         subsets.append(pick[mask])
+         mask ^= pick[mask]
+      subsets.reverse()
+
+      # order each aircraft's round-trip with its own range
+      destinations = [airport._airport_code for airport in self._airports[1:]]
+      total = 0
+      routes = []
+      for aircraft, subset in zip(fleet, subsets):
+         if not subset:
+            routes.append((aircraft._aircraft_code, None))
+            continue
+         self.load_row([airport_codes[0]] +
+                       [code for i, code in enumerate(destinations) if subset >> i & 1] +
+                       [aircraft._aircraft_code])
+         best_route = self._solve_uncached()
+         total += best_route[1][-2]
+         routes.append((aircraft._aircraft_code,
+                        (self.route_codes(best_route), best_route[1][-2])))
+      return round(total, 2), routes
+
+   def solve(self):
+      """A method that returns the cheapest valid round-trip for the loaded row,
+      as the home airport and the journey, in the form returned by
+      return_cheapest_route. Returns None where no valid round-trip exists.
+      Where the Router has a cache, a route already found for the same home
+      airport, destinations, aircraft range, rates, and solving method, as
+      given by _cache_method, is returned from it.
+      """
+      profile = self._profile
+      if profile is not None:
+         started = profile.start()
+         best_route = self._solve_cached()
+         profile.stop('solve', started)
+         return best_route
+      return self._solve_cached()
+
+   def _solve_cached(self):
+      """A method that returns the cheapest valid round-trip for the loaded row,
+      as solve does, from the cache where the Router has one.
+      """
+      if self._cache is None:
+         return self._solve_uncached()
+
+      key = RouteCache.key(self._airports[0]._airport_code,
+                           [airport._airport_code for airport in self._airports[1:]],
+                           self._aircraft._range, self._data._rates_version,
+                           self._cache_method())
+      cached = self._cache.get(key)
+
+      if self._profile is not None:
+         self._profile.count('route_cache_misses' if cached is RouteCache._missing
+                             else 'route_cache_hits')
+
+      if cached is RouteCache._missing:
+         previous = self._cache.previous(key)
+         if previous is RouteCache._missing:
+            best_route = self._solve_uncached()
+         else:
+            best_route = self._solve_warm(previous)
+         if best_route is None:
+            self._cache.put(key, None)
+         else:
+            self._cache.put(key, [[airport._airport_code for airport in
+                                   best_route[1][:-2]], best_route[1][-2]])
+         return best_route
+
+      self._nodes_explored = self._nodes_pruned = 0
+      if cached is None:
+         return None
+      codes, cost = cached
+      journey = [self._airport_dict[code] for code in codes]
+      journey.append(cost)
+      journey.append(None)
+      return self._airports[0], journey
+
+   def _cache_method(self):
+      """A method that returns how the loaded row's route is found, as part of
+      its cache key: 'exact' for any exact solver, as they find routes of the
+      same cost, else the heuristic with its budgets. Routes with refuelling
+      stops, and distances read from the distance store, which may differ in
+      cost by a cent, are marked apart.
+      """
+      method = 'exact'
+      if self._row_solver() == 'heuristic':
+         method = 'heuristic:{0}:{1}'.format(self._time_budget,
+                                             self._iteration_budget)
+      if self._refuel:
+         method += '+refuel'
+      if self._data._distance_store is not None:
+         method += '+distances'
+      return method
+
+   def _solve_warm(self, previous):
+      """A method that solves the loaded row again after the rates changed,
+      starting from the route found for it before. Rates do not change which
+      routes are valid, so where there was no valid round-trip there is still
+      none. Otherwise the previous route, costed at the new rates, bounds
+      branch and bound from the start, so that most branches are pruned at
+      once. Where Held-Karp would solve the row, the previous route bounds
+      the states it keeps, and where the heuristic would, it searches from the
+      previous route instead. Returns the cheapest valid round-trip, as solve
+      does.
+
+      Parameters
+      ----------
+      previous: list
+         The destination codes in order and the cost, as cached before the
+         rates changed; or None.
+      """
+      if previous is None:
+         return None
+
+      if self._profile is not None:
+         self._profile.count('warm_starts')
+
+      positions = {airport._airport_code: i for i, airport in enumerate(self._airports)}
+      incumbent = [positions[code] for code in previous[0] if code in positions]
+      if len(incumbent) != len(self._airports) - 1:
+         return self._solve_uncached()
+
+      solver = self._row_solver()
+      if solver == 'heuristic':
+         return self._heuristic(incumbent)
+      if solver == 'held_karp':
+         return self._held_karp(incumbent)
+      return self._branch_and_bound(incumbent)
+
+   def update_rates(self, changed):
+      """A method that brings the Router up to date after Data.update_rates
+      changed the rates of the currencies in changed. Airport instances see
+      the new rates through their records; for the loaded row, only the leg
+      costs departing airports paid for in a changed currency are costed
+      again; distances and ranges are unchanged. With refuelling, the paths via
+      stops are costed at several airports' rates, so they are found again.
+      Routes in the Router's cache are solved again from their previous
+      routes, by _solve_warm, as they are next asked for.
+
+      Parameters
+      ----------
+      changed: set
+         The currency codes whose rates changed, as returned by
+         Data.update_rates.
+      """
+      if not changed or not self._airports:
+         return
+
+      if self._refuel:
+         self._refuel_paths.clear()
+         self._build_matrices()
+         return
+
+      for i, airport in enumerate(self._airports):
+         if airport._currency in changed:
+            rate = airport._to_euro_rate
+            self._leg_costs[i] = [distance * rate for distance in self._distances[i]]
+
+   def _row_solver(self):
+      """A method that returns the solver used for the loaded row: the one the
+      Router was created with or, for 'auto', the one chosen by the row's
+      number of destinations.
+      """
+      if self._solver != 'auto':
+         return self._solver
+      if len(self._airports) - 1 <= Router._enumeration_limit:
+         return 'permutations'
+      if len(self._airports) - 1 <= Router._exact_limit:
+         return 'held_karp'
+      return 'heuristic'
+
+   def _solve_uncached(self):
+      """A method that returns the cheapest valid round-trip for the loaded row,
+      as solve does, using the solver the Router was created with.
+      """
+      solver = self._row_solver()
+
+      if self._profile is not None:
+         self._profile.count('rows_solved_' + solver)
+
+      if solver == 'held_karp':
+         return self._held_karp()
+
+      if solver == 'branch_and_bound':
+         best_route = self._branch_and_bound()
+         if self._profile is not None:
+            self._profile.count('nodes_explored', self._nodes_explored)
+            self._profile.count('nodes_pruned', self._nodes_pruned)
+         return best_route
+
+      if solver == 'vectorised':
+         return self._vectorised()
+
+      if solver == 'heuristic':
+         return self._heuristic()
+
+      routes = self._stream_cheapest_routes()
+      return routes[0] if routes else None
+
+_RESULT = """
+   Starting Airport:     {0}
+   Destination airports: {1}
+
+   Best route: {2}
+
+   Cost:           E {3}
+
+   __________________________________________________
+
+   """
+
+_NO_ROUTE = """
+   Starting Airport:     {0}
+   Destination airports: {1}
+
+   No route within range of aircraft {2}.
+
+   __________________________________________________
+
+   """
+
+_SEARCH = "   Nodes explored: {0}, pruned: {1}\n"
+
+_GAP = "   Heuristic gap to optimum: {0:.2%}\n"
+
+_ALTERNATIVES = "   Cheapest {0} routes:\n\n{1}\n"
+
+_TRADE_OFF = "   Cost / distance trade-off:\n\n{0}\n"
+
+_ALTERNATIVE = "      E {0:>10}   {1:>9.1f} km   {2}\n"
+
+_STOPPED = "   Search stopped at the time budget; routes may not be the best.\n"
+
+# Router of the current process, set by _init_worker
+_worker_router = None
+
+# alternatives to the cheapest route reported per row, set by _init_worker
+_worker_top = 1
+_worker_pareto = False
+
+def _init_worker(data_store, solver, cache=None, refuel=False, time_budget=1.0,
+                 iteration_budget=None, profile=False, top=1, pareto=False,
+                 report_gap=False):
+   """Creates the Router used by _solve_row in the current process. Passed as
+   the initialiser of the process pool in main, so that each worker builds
+   its Router once; the populated Data instance is inherited from the parent
+   process, not read again from the CSV files. Likewise the route cache, of
+   which each worker then holds its own copy.
+
+   Parameters
+   ----------
+   data_store: Data instance
+      Populated reference data.
+
+   solver: string
+      The solver for the Router, one of Router._solvers.
+
+   cache: RouteCache instance
+      Cache of routes already found, or None.
+
+   refuel: bool
+      Whether legs beyond the aircraft's range are flown via refuelling stops.
+
+   time_budget: float
+      Seconds the heuristic solver may spend per row, or None.
+
+   iteration_budget: int
+      Rounds of improvement the heuristic solver may make per row, or None.
+
+   profile: bool
+      Whether the Router records a Profile, collected by _solve_row_profiled.
+
+   top: int
+      The number of cheapest routes to report per row, where more than 1.
+
+   pareto: bool
+      Whether to report the cost/distance trade-off per row.
+
+   report_gap: bool
+      Whether the heuristic solver reports its gap to the optimum, on rows
+      small enough to find it.
+   """
+   global _worker_router, _worker_top, _worker_pareto
+   _worker_top = top
+   _worker_pareto = pareto
+   _worker_router = Router(data_store, solver, cache=cache, refuel=refuel,
+                           time_budget=time_budget,
+                           iteration_budget=iteration_budget,
+                           profile=Profile() if profile else None,
+                           report_gap=report_gap)
+
+def _row_error(data_store, row):
+   """Returns the message with which Router.load_row would quit on a row, or
+   None where the row can be loaded. main checks each row with it before
+   handing it to a process pool, as a worker quitting would leave the pool
+   waiting for its result.
+
+   Parameters
+   ----------
+   data_store: Data instance
+      Populated reference data.
+
+   row: list
+      A row from the test csv file, as passed to Router.load_row.
+   """
+   airport_codes = [code for code in row[:-1] if code]
+   if len(airport_codes) < 2:
+      return "A Row Has No Destination Airports."
+   if len(set(airport_codes)) < len(airport_codes):
+      return "An Airport Is Named More Than Once in a Row."
+   if row[-1] not in data_store._aircraft_index:
+      return "An Aircraft Code Was Not Found."
+   if any(code not in data_store._resolved_airports for code in airport_codes):
+      return "An Error Has Occurred Populating Airport Fields."
+   return None
+
+def _solve_row(row):
+   """Finds the cheapest route for one row of the test csv file, with the
+   current process' Router, and returns the formatted output for that row.
+
+   Parameters
+   ----------
+   row: list
+      A row from the test csv file, as passed to Router.load_row.
+   """
+   router = _worker_router
+   router.load_row(row)
+   best_route = router.solve()
+
+   home = router._airports[0]._airport_code
+   destinations = ', '.join(airport._airport_code for airport in
+                            router._airports[1:])
+
+   if best_route is None:
+      return _NO_ROUTE.format(home, destinations, row[-1])
+
+   # tuple best route first element: home airport
+   # present latter beginning and end, as home —> 1st destination
+   # and last desination —> home are factored in in Router._cost_journeys
+   output = _RESULT.format(home,
+                           destinations,
+                           '  —>  '.join(router.route_codes(best_route)),
+                           best_route[1][-2])
+
+   if router._solver == 'branch_and_bound':
+      output += '\n' + _SEARCH.format(router._nodes_explored, router._nodes_pruned)
+
+   if router._gap is not None:
+      output += '\n' + _GAP.format(router._gap)
+
+   if _worker_top > 1:
+      routes = router.top_routes(_worker_top, best_route)
+      output += '\n' + _ALTERNATIVES.format(len(routes), ''.join(
+         _ALTERNATIVE.format(route[1][-2], router.route_distance(route),
+                             '  —>  '.join(router.route_codes(route)))
+         for route in routes))
+      if router._search_stopped:
+         output += _STOPPED
+
+   if _worker_pareto:
+      output += '\n' + _TRADE_OFF.format(''.join(
+         _ALTERNATIVE.format(route[1][-2], router.route_distance(route),
+                             '  —>  '.join(router.route_codes(route)))
+         for route in router.pareto_routes(best_route)))
+      if router._search_stopped:
+         output += _STOPPED
+
+   return output
+
+def _solve_row_profiled(row):
+   """Formats the output for one row, as _solve_row does, and returns it with
+   the Profile recorded for the row, replacing the current process' Profile
+   with a new one, so that each row's Profile is returned once.
+
+   Parameters
+   ----------
+   row: list
+      A row from the test csv file, as passed to Router.load_row.
+   """
+   started = Profile.start()
+   output = _solve_row(row)
+   profile = _worker_router._profile
+   profile.stop('row', started)
+   _worker_router._profile = Profile()
+   return output, profile
+
+# leg costs and distances of the row being split, set by _init_split
+_split_matrices = None
+
+def _init_split(leg_costs, distances):
+   """Hands the matrices of the row being split by Router.split_routes to the
+   current process, once, as the initialiser of its process pool.
+
+   Parameters
+   ----------
+   leg_costs: list
+      The row's leg costs, as built by Router._build_matrices.
+
+   distances: list
+      The row's distances, as built by Router._build_matrices.
+   """
+   global _split_matrices
+   _split_matrices = (leg_costs, distances)
+
+def _subset_tour_costs(aircraft_range):
+   """Returns, for an aircraft of aircraft_range km, the cost of the cheapest
+   valid round-trip from the home airport over every subset of the
+   destinations of the row being split, as a list indexed by the subset's
+   bitmask, as in Router._held_karp; infinite where there is none. One
+   Held-Karp table yields every subset, since it records the cheapest path
+   over each subset to each destination, which is closed by the leg home.
+
+   Parameters
+   ----------
+   aircraft_range: float
+      The aircraft's range, in km.
+   """
+   leg_costs, distances = _split_matrices
+   n = len(leg_costs)
+   full = (1 << (n - 1)) - 1
+   infinity = float('inf')
+   in_range = [[distances[i][j] <= aircraft_range for j in range(n)]
+               for i in range(n)]
+
+   cost = [[infinity] * n for _ in range(full + 1)]
+   for j in range(1, n):
+      if in_range[0][j]:
+         cost[1 << (j-1)][j] = leg_costs[0][j]
+
+   for mask in range(1, full + 1):
+      row = cost[mask]
+      for j in range(1, n):
+         if row[j] == infinity:
             continue
-         return self._airports[0], journey
+         for k in range(1, n):
+            bit = 1 << (k-1)
+            if mask & bit or not in_range[j][k]:
+               continue
+            candidate = row[j] + leg_costs[j][k]
+            if candidate < cost[mask | bit][k]:
+               cost[mask | bit][k] = candidate
+
+   tours = [0.0] + [infinity] * full
+   for mask in range(1, full + 1):
+      tours[mask] = min([cost[mask][j] + leg_costs[j][0] for j in range(1, n)
+                         if mask >> (j-1) & 1 and in_range[j][0]], default=infinity)
+   return tours
+
+def _cover_masks(task):
+   """Returns, for every step-th subset of the destinations of the row being
+   split from the start-th, the cheapest cost of covering it with one more
+   aircraft than before, and the subset that aircraft then takes, empty
+   where it is better left idle and may be. Weighs every subset of the subset
+   for the aircraft, the rest being covered as cheaply as before. Run in parallel
+   by Router.split_routes, each task taking an interleaved share of the
+   subsets.
+
+   Parameters
+   ----------
+   task: tuple
+      The aircraft's round-trip costs, as returned by _subset_tour_costs;
+      the cheapest costs of covering each subset before, indexed by
+      bitmask; whether the aircraft may be left idle; and the start and step
+      of the subsets to weigh.
+   """
+   tours, best, idle, start, step = task
+   covers = []
+   subsets = []
+   for mask in range(start, len(best), step):
+      cheapest = best[mask] if idle else float('inf')
+      taken = 0
+      subset = mask
+      while subset:
+         cost = tours[subset] + best[mask ^ subset]
+         if cost < cheapest:
+            cheapest = cost
+            taken = subset
+         subset = (subset - 1) & mask
+      covers.append(cheapest)
+      subsets.append(taken)
+   return covers, subsets
+
+def _parse_request(data_store, request):
+   """Returns the row to solve for one route request, as passed to
+   Router.load_row. A request is either a dict naming the home airport, the
+   destinations, and the aircraft, e.g.
+
+      {"home": "DUB", "destinations": ["LHR", "CDG"], "aircraft": "A320"}
+
+   or a list in the layout of a row, e.g. ["DUB", "LHR", "CDG", "A320"], with
+   any number of destinations. Raises ValueError, with a message for the
+   result, where the request is malformed, names an airport or aircraft not
+   in the data, or names an airport more than once, as cached routes are
+   keyed by the set of destinations.
+
+   Parameters
+   ----------
+   data_store: Data instance
+      Populated reference data.
+
+   request: dict or list
+      One decoded request.
+   """
+   if isinstance(request, list):
+      request = {'home': request[0] if request else None,
+                 'destinations': request[1:-1], 'aircraft': request[-1] if request else None}
+   if not isinstance(request, dict):
+      raise ValueError("request is not a JSON object or array")
+
+   home = request.get('home')
+   destinations = request.get('destinations')
+   aircraft = request.get('aircraft')
+   if not isinstance(home, str) or not isinstance(aircraft, str) or \
+      not isinstance(destinations, list) or not destinations or \
+      not all(isinstance(code, str) for code in destinations):
+      raise ValueError("request needs a home airport code, a list of "
+                       "destination codes, and an aircraft code")
+
+   seen = set()
+   for code in [home] + destinations:
+      if code not in data_store._resolved_airports:
+         raise ValueError("unknown airport {0}".format(code))
+      if code in seen:
+         raise ValueError("airport {0} is named more than once".format(code))
+      seen.add(code)
+   if aircraft not in data_store._aircraft_index:
+      raise ValueError("unknown aircraft {0}".format(aircraft))
+
+   return [home] + destinations + [aircraft]
+
+def _solve_request(row):
+   """Finds the cheapest route for one row, with the current process' Router,
+   and returns the result as a dict: the home airport and aircraft codes,
+   then the destinations in the order flown, every airport of the route with
+   refuelling stops in parentheses, its cost, and the distance flown in km;
+   or, where no route is within the aircraft's range, the reason in place of
+   the route. Where set by _init_worker, the cheapest routes and the cost/
+   distance trade-off follow, under "top" and "pareto", with "top_stopped" or
+   "pareto_stopped" set where the search for them stopped at the time budget.
+
+   Parameters
+   ----------
+   row: list
+      A row as returned by _parse_request.
+   """
+   router = _worker_router
+   router.load_row(row)
+   best_route = router.solve()
+
+   result = {'home': row[0], 'aircraft': row[-1]}
+   if best_route is None:
+      result['error'] = "no route within range of aircraft {0}".format(row[-1])
+      return result
+
+   result.update(_describe_route(router, best_route))
+
+   if _worker_top > 1:
+      result['top'] = [_describe_route(router, route)
+                       for route in router.top_routes(_worker_top, best_route)]
+      if router._search_stopped:
+         result['top_stopped'] = True
+   if _worker_pareto:
+      result['pareto'] = [_describe_route(router, route)
+                          for route in router.pareto_routes(best_route)]
+      if router._search_stopped:
+         result['pareto_stopped'] = True
+   return result
+
+def _describe_route(router, best_route):
+   """Returns a route found for the Router's loaded row as a dict of the
+   destinations in the order flown, every airport of the route with
+   refuelling stops in parentheses, its cost, and the distance flown in km.
+
+   Parameters
+   ----------
+   router: Router instance
+      The Router which found the route.
+
+   best_route: tuple
+      The home airport and journey, as returned by Router.solve.
+   """
+   return {'order': [airport._airport_code for airport in best_route[1][:-2]],
+           'route': router.route_codes(best_route),
+           'cost': best_route[1][-2],
+           'distance': round(router.route_distance(best_route), 1)}
+
+def _solve_record(line):
+   """Answers one line of JSON Lines input with the current process' Router,
+   returning one line of JSON output, without its newline. A request's "id",
+   where given, is echoed in its result. A line which cannot be answered
+   gets a result with an "error" in place of the route.
+
+   Parameters
+   ----------
+   line: string
+      One line of input, holding a request as read by _parse_request.
+   """
+   result = dict()
+   try:
+      request = json.loads(line)
+   except ValueError:
+      result['error'] = "request is not valid JSON"
+      return json.dumps(result)
+
+   if isinstance(request, dict) and request.get('id') is not None:
+      result['id'] = request['id']
+   try:
+      row = _parse_request(_worker_router._data, request)
+   except ValueError as error:
+      result['error'] = str(error)
+      return json.dumps(result)
+
+   result.update(_solve_request(row))
+   return json.dumps(result)
+
+def _solve_record_profiled(line):
+   """Answers one line of JSON Lines input, as _solve_record does, and returns
+   the output with the Profile recorded for the line, replacing the current
+   process' Profile with a new one, so that each line's Profile is returned
+   once.
+
+   Parameters
+   ----------
+   line: string
+      One line of input, holding a request as read by _parse_request.
+   """
+   started = Profile.start()
+   output = _solve_record(line)
+   profile = _worker_router._profile
+   profile.stop('row', started)
+   _worker_router._profile = Profile()
+   return output, profile
+
+def _stream_records(lines, workers, initargs, batch_size=256, profile=None):
+   """Answers each non-blank line of JSON Lines input in turn, writing one
+   line of JSON output per line of input, in the same order, and flushing
+   each, so that results can be read while the run goes on. Lines are read
+   one at a time, and with several workers handed to the pool a batch at a
+   time, so that memory stays flat however long the input.
+
+   Parameters
+   ----------
+   lines: iterable
+      Lines of input, e.g. an open file or sys.stdin.
+
+   workers: int
+      The number of processes to solve in.
+
+   initargs: tuple
+      Arguments of _init_worker.
+
+   batch_size: int
+      Lines handed to the pool at a time, per worker.
+
+   profile: Profile instance
+      The run's Profile, into which each line's Profile is merged, where
+      initargs ask workers to record one; or None.
+   """
+   records = (line for line in lines if line.strip())
+   solve_record = _solve_record if profile is None else _solve_record_profiled
+
+   def write(outputs):
+      for output in outputs:
+         if profile is not None:
+            output, record_profile = output
+            profile.merge(record_profile)
+         sys.stdout.write(output + '\n')
+         sys.stdout.flush()
+
+   if workers == 1:
+      _init_worker(*initargs)
+      write(map(solve_record, records))
+      return
+
+   with multiprocessing.Pool(workers, _init_worker, initargs) as pool:
+      while True:
+         batch = list(islice(records, batch_size * workers))
+         if not batch:
+            break
+         write(pool.imap(solve_record, batch, chunksize=8))
 
 def main():
    """Driver function. Initialises and prepares Data and Router instances.
    Opens the test csv file via the Data instance's attribute, and generates a 
    cheapest route for each line / journey. Prints formatted output of each 
-   best journey to terminal.
+   best journey to terminal. With more than one worker, rows are spread across
+   a pool of processes, and output is printed in the order of the rows. With
+   --jsonl, requests are streamed from JSON Lines input instead, by
+   _stream_records.
    """
 
-   inputs = Data()
-   router = Router(inputs)
+   parser = argparse.ArgumentParser(description="Finds the most economic route "
+                                    "for each row of the test csv file.")
+   parser.add_argument('--solver', choices=Router._solvers, default='auto',
+                       help="method used to find the cheapest route")
+   parser.add_argument('--data-dir',
+                       help="directory holding the csv files")
+   parser.add_argument('--workers', type=int, default=1,
+                       help="number of processes to solve rows in; 0 for one "
+                       "per CPU")
+   parser.add_argument('--refuel', action='store_true',
+                       help="fly legs beyond the aircraft's range via "
+                       "refuelling stops at other airports")
+   parser.add_argument('--time-budget', type=float, default=1.0,
+                       help="seconds the heuristic solver may spend per row")
+   parser.add_argument('--iterations', type=int,
+                       help="rounds of improvement the heuristic solver may "
+                       "make per row, in addition to the time budget")
+   parser.add_argument('--report-gap', action='store_true',
+                       help="report the heuristic solver's gap to the optimum "
+                       "on rows small enough to solve exactly, taking time "
+                       "beyond its budget")
+   parser.add_argument('--cache-size', type=int, default=1024,
+                       help="number of routes kept in the route cache")
+   parser.add_argument('--cache-file',
+                       help="file in which the route cache persists across "
+                       "runs; with several workers, only routes already in "
+                       "the file are shared")
+   parser.add_argument('--reachable', nargs=2, metavar=('AIRPORT', 'AIRCRAFT'),
+                       help="list the airports the aircraft can reach from the "
+                       "airport, then exit")
+   parser.add_argument('--fleet', nargs='+', metavar='AIRPORT',
+                       help="list the cheapest route from the first airport "
+                       "via the rest for every aircraft, then exit")
+   parser.add_argument('--split', nargs='+', metavar='AIRPORT',
+                       help="split the airports after the first among the "
+                       "aircraft given by --aircraft, then exit")
+   parser.add_argument('--aircraft', nargs='+', metavar='CODE',
+                       help="the aircraft to split airports among, with "
+                       "--split; codes may repeat")
+   parser.add_argument('--allow-idle', action='store_true',
+                       help="with --split, let an aircraft fly no destination "
+                       "where that is cheaper; by default every aircraft "
+                       "flies at least one")
+   parser.add_argument('--max-stops', type=int, metavar='N',
+                       help="with --split, the most destinations any one "
+                       "aircraft may fly")
+   parser.add_argument('--build-snapshot', action='store_true',
+                       help="write the airport snapshot from the csv files, "
+                       "then exit")
+   parser.add_argument('--distance-store', action='store_true',
+                       help="read distances from the precomputed store of every "
+                       "pair of airports, regenerating it where airport.csv "
+                       "has changed")
+   parser.add_argument('--top', type=int, default=1, metavar='K',
+                       help="also report the K cheapest routes per row")
+   parser.add_argument('--pareto', action='store_true',
+                       help="also report the routes trading cost against "
+                       "distance per row")
+   parser.add_argument('--jsonl', nargs='?', const='-', metavar='FILE',
+                       help="read route requests as JSON Lines from FILE, or "
+                       "stdin, in place of the test csv file, and write one "
+                       "JSON result per line")
+   parser.add_argument('--profile', nargs='?', const='-', metavar='FILE',
+                       help="write the time spent in each stage, and counts "
+                       "of the work done, as JSON to FILE, or to stderr")
+   args = parser.parse_args()
+
+   if args.build_snapshot:
+      inputs = Data(use_snapshot=False, data_dir=args.data_dir)
+      inputs.populate_dicts()
+      inputs.write_snapshot()
+      return
 
+   profile = Profile() if args.profile else None
+   if profile is not None:
+      run_started = started = profile.start()
+
+   inputs = Data(data_dir=args.data_dir)
    inputs.populate_dicts()
+   if args.distance_store:
+      inputs.distance_store()
 
-   result = """
-   Starting Airport:     {0}
-   Destination airports: {1}
+   if profile is not None:
+      profile.stop('data_load', started)
+
+   if args.reachable:
+      code, aircraft_code = args.reachable
+      aircraft = Aircraft(inputs, aircraft_code)
+      reachable = inputs.reachable_airports(code, aircraft._range)
+      print("\n   Airports within {0:.0f} km of {1} ({2}): {3}\n".format(
+            aircraft._range, code, aircraft_code, len(reachable)))
+      for distance, other in reachable:
+         print("   {0:<5} {1:>9.1f} km".format(other, distance))
+      return
 
-   Best route: {2}  —>  {3}  —>  {4}  —>  {5}  —>  {6}  —>  {2}
+   if args.split:
+      if not args.aircraft:
+         print("Splitting Requires --aircraft.\nQuitting")
+         sys.exit()
+      if args.refuel:
+         print("Splitting Does Not Support --refuel.\nQuitting")
+         sys.exit()
+      router = Router(inputs, args.solver, time_budget=args.time_budget,
+                      iteration_budget=args.iterations)
+      split = router.split_routes(args.split, args.aircraft,
+                                  args.workers or os.cpu_count(),
+                                  every_aircraft=not args.allow_idle,
+                                  max_stops=args.max_stops)
+      print("\n   Split of {0} via {1} across {2}\n".format(
+            args.split[0], ', '.join(args.split[1:]), ', '.join(args.aircraft)))
+      if split is None:
+         print("   No split within range and limits of the aircraft.\n")
+         return
+      total, routes = split
+      for code, route in routes:
+         if route is None:
+            print("   {0:<6} idle".format(code))
+            continue
+         codes, cost = route
+         print("   {0:<6} E {1:>10}   {2}".format(code, cost, '  —>  '.join(codes)))
+      print("\n   Total:   E {0}\n".format(total))
+      return
 
-   Cost:           E {7}
+   if args.fleet:
+      router = Router(inputs, args.solver, refuel=args.refuel,
+                      time_budget=args.time_budget,
+                      iteration_budget=args.iterations)
+      print("\n   Fleet for {0} via {1}\n".format(args.fleet[0],
+                                                 ', '.join(args.fleet[1:])))
+      for code, aircraft_range, best_route in router.compare_fleet(args.fleet):
+         if best_route is None:
+            print("   {0:<6} {1:>9.0f} km   out of range".format(code, aircraft_range))
+            continue
+         print("   {0:<6} {1:>9.0f} km   E {2:>10}   {3}".format(
+               code, aircraft_range, best_route[1][-2],
+               '  —>  '.join(router.route_codes(best_route))))
+      return
 
-   __________________________________________________
+   workers = args.workers or os.cpu_count()
+   cache = RouteCache(args.cache_size, args.cache_file)
 
-   """
+   initargs = (inputs, args.solver, cache, args.refuel, args.time_budget,
+               args.iterations, profile is not None, args.top, args.pareto,
+               args.report_gap)
+   solve_row = _solve_row if profile is None else _solve_row_profiled
 
-   with open (inputs._input_test) as file:
-      reader = csv.reader(file)
-      next(reader)
-      for row in reader:
-         router.load_row(row)
-         router.add_cost_add_flag()
-         best_route = router.return_cheapest_route()
-
-         # tuple best route first element: home airport
-         # present latter beginning and end, as home —> 1st destination
-         # and last desination —> home are factored in in Router.add_cost_add_flag
-         print(result.format( row[0],
-                              ', '.join(row[1:5]),
-                              best_route[0]._airport_code,
-                              best_route[1][0]._airport_code,
-                              best_route[1][1]._airport_code,
-                              best_route[1][2]._airport_code,
-                              best_route[1][3]._airport_code,
-                              best_route[1][4]))
+   def print_outputs(outputs):
+      for output in outputs:
+         if profile is not None:
+            output, row_profile = output
+            profile.merge(row_profile)
+         print(output)
+
+   if args.jsonl:
+      if args.jsonl == '-':
+         _stream_records(sys.stdin, workers, initargs, profile=profile)
+      else:
+         with open(args.jsonl) as file:
+            _stream_records(file, workers, initargs, profile=profile)
+      if workers == 1:
+         cache.save()
+
+   else:
+      if not inputs._input_test:
+         print("The Test File Was Not Found.\nQuitting")
+         sys.exit()
+      with open (inputs._input_test) as file:
+         reader = csv.reader(file)
+         next(reader)
+
+         if workers == 1:
+            _init_worker(*initargs)
+            print_outputs(map(solve_row, reader))
+            cache.save()
+         else:
+            # Data is populated before the pool starts, so workers share its
+            # pages; rows are checked here a batch at a time, so that a row
+            # load_row would quit on stops the run here, not in a worker
+            with multiprocessing.Pool(workers, _init_worker, initargs) as pool:
+               while True:
+                  batch = list(islice(reader, 256 * workers))
+                  if not batch:
+                     break
+                  errors = [_row_error(inputs, row) for row in batch]
+                  valid = next((i for i, error in enumerate(errors) if error),
+                               len(batch))
+                  print_outputs(pool.imap(solve_row, batch[:valid], chunksize=8))
+                  if valid < len(batch):
+                     print(errors[valid] + "\nQuitting")
+                     sys.exit()
+
+   if profile is not None:
+      profile.stop('total', run_started)
+      report = json.dumps(profile.as_dict(), indent=1)
+      if args.profile == '-':
+         print(report, file=sys.stderr)
+      else:
+         with open(args.profile, 'w') as profile_file:
+            profile_file.write(report + '\n')
 
 if __name__ == "__main__":
    main()
\ No newline at end of file
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+"""
+A long-running route server for router.py. The reference data is read and
+indexed once, at start up, then route requests are answered over a Unix or
+TCP socket until the server is stopped. Run from the command line, e.g.
+
+   python server.py --socket /tmp/router.sock
+   python server.py --port 8750 --data-dir /path/to/csvs
+
+Requests and replies are JSON objects, one per line. A request names the home
+airport, the destinations, and the aircraft, and may carry an "id", which is
+echoed in its reply:
+
+   {"id": 1, "home": "DUB", "destinations": ["LHR", "CDG"], "aircraft": "A320"}
+
+   {"id": 1, "home": "DUB", "aircraft": "A320", "order": ["LHR", "CDG"],
+    "route": ["DUB", "LHR", "CDG", "DUB"], "cost": 612.1, "distance": 1253.2}
+
+A request may also be a list in the layout of a row, as read by
+router._parse_request. A request which cannot be answered gets a reply with
+an "error" in place of the route. A connection may send any number of
+requests; replies are sent in the order of the requests. Solving is
+CPU-bound, so it runs in a pool of processes, and a long solve on one
+connection does not hold up another.
+"""
+
+import os
+import json
+import asyncio
+import argparse
+import concurrent.futures
+
+import router as prog
+
+async def answer(data, executor, line):
+   """Returns the reply to one request line, as a dict, solving the route in
+   executor, so that the event loop is free to serve other connections.
+
+   Parameters
+   ----------
+   data: Data instance
+      Populated reference data.
+
+   executor: concurrent.futures.Executor instance
+      Pool whose workers have been set up by router._init_worker.
+
+   line: bytes
+      One line received from a client, holding a request.
+   """
+   reply = dict()
+   try:
+      request = json.loads(line)
+   except ValueError:
+      reply['error'] = "request is not valid JSON"
+      return reply
+   if isinstance(request, dict) and request.get('id') is not None:
+      reply['id'] = request['id']
+
+   try:
+      row = prog._parse_request(data, request)
+   except ValueError as error:
+      reply['error'] = str(error)
+      return reply
+
+   loop = asyncio.get_running_loop()
+   try:
+      reply.update(await loop.run_in_executor(executor, prog._solve_request, row))
+   except Exception as error:
+      reply['error'] = "solve failed: {0}".format(error)
+   return reply
+
+async def handle_connection(data, executor, reader, writer):
+   """Answers each request line of one client connection in turn, until the
+   client closes it.
+
+   Parameters
+   ----------
+   data: Data instance
+      Populated reference data.
+
+   executor: concurrent.futures.Executor instance
+      Pool in which routes are solved.
+
+   reader, writer: asyncio.StreamReader, asyncio.StreamWriter instances
+      The client connection, as passed by asyncio.start_server.
+   """
+   try:
+      while True:
+         line = await reader.readline()
+         if not line:
+            break
+         if not line.strip():
+            continue
+         reply = await answer(data, executor, line)
+         writer.write(json.dumps(reply).encode() + b'\n')
+         await writer.drain()
+   except ConnectionError:
+      pass
+   finally:
+      writer.close()
+
+async def start(data, executor, host=None, port=None, path=None):
+   """Starts serving route requests and returns the asyncio server, listening
+   on the Unix socket path where given, else on host and port.
+
+   Parameters
+   ----------
+   data: Data instance
+      Populated reference data.
+
+   executor: concurrent.futures.Executor instance
+      Pool whose workers have been set up by router._init_worker.
+
+   host: string
+      TCP host to listen on, where path is None.
+
+   port: int
+      TCP port to listen on, where path is None; 0 for any free port.
+
+   path: string
+      Filepath of the Unix socket to listen on, or None.
+   """
+   def client_connected(reader, writer):
+      return handle_connection(data, executor, reader, writer)
+
+   if path is not None:
+      if os.path.exists(path):
+         os.remove(path)
+      return await asyncio.start_unix_server(client_connected, path=path)
+   return await asyncio.start_server(client_connected, host=host, port=port)
+
+async def serve(args):
+   """Loads the reference data once, starts the pool of solving processes,
+   and serves requests until cancelled.
+
+   Parameters
+   ----------
+   args: argparse.Namespace
+      The parsed command line arguments.
+   """
+   data = prog.Data(data_dir=args.data_dir)
+   data.populate_dicts()
+   if args.distance_store:
+      data.distance_store()
+
+   # Data is populated, and the distance store opened, before the pool
+   # starts, so workers share their pages
+   cache = prog.RouteCache(args.cache_size)
+   executor = concurrent.futures.ProcessPoolExecutor(
+      args.workers or os.cpu_count(), initializer=prog._init_worker,
+      initargs=(data, args.solver, cache, args.refuel, args.time_budget, None,
+                False, args.top, args.pareto))
+
+   with executor:
+      server = await start(data, executor, args.host, args.port, args.socket)
+      where = args.socket or '{0}:{1}'.format(
+         *server.sockets[0].getsockname()[:2])
+      print("Serving routes on {0}".format(where), flush=True)
+      async with server:
+         await server.serve_forever()
+
+def main():
+   """Driver function. Parses the command line and runs the server until
+   interrupted.
+   """
+   parser = argparse.ArgumentParser(description="Serves cheapest route "
+                                    "requests over a local socket.")
+   parser.add_argument('--socket',
+                       help="Unix socket to listen on, in place of TCP")
+   parser.add_argument('--host', default='127.0.0.1',
+                       help="TCP host to listen on")
+   parser.add_argument('--port', type=int, default=8750,
+                       help="TCP port to listen on")
+   parser.add_argument('--data-dir',
+                       help="directory holding the csv files")
+   parser.add_argument('--solver', choices=prog.Router._solvers, default='auto',
+                       help="method used to find the cheapest route")
+   parser.add_argument('--workers', type=int, default=0,
+                       help="number of processes to solve routes in; 0 for "
+                       "one per CPU")
+   parser.add_argument('--refuel', action='store_true',
+                       help="fly legs beyond the aircraft's range via "
+                       "refuelling stops at other airports")
+   parser.add_argument('--time-budget', type=float, default=1.0,
+                       help="seconds the heuristic solver may spend per route")
+   parser.add_argument('--distance-store', action='store_true',
+                       help="read distances from the precomputed store of every "
+                       "pair of airports")
+   parser.add_argument('--top', type=int, default=1, metavar='K',
+                       help="also reply with the K cheapest routes")
+   parser.add_argument('--pareto', action='store_true',
+                       help="also reply with the routes trading cost against "
+                       "distance")
+   parser.add_argument('--cache-size', type=int, default=1024,
+                       help="number of routes kept in each worker's route cache")
+   args = parser.parse_args()
+
+   try:
+      asyncio.run(serve(args))
+   except KeyboardInterrupt:
+      pass
+
+if __name__ == "__main__":
+   main()
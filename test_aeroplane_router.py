@@ -1,5 +1,13 @@
+import io
+import os
+import json
+import asyncio
+import tempfile
 import unittest
+import contextlib
+import concurrent.futures
 import router as prog
+import server
 
 class Test(unittest.TestCase):
 
@@ -27,11 +35,473 @@ class Test(unittest.TestCase):
       self.assertEqual(self._airport._longitude, 4.763889)
       self.assertEqual(self._airport._country, 'Netherlands')
       self.assertEqual(self._airport._currency, 'EUR')
-      self.assertEqual(self._airport._to_euro_rate, '1')
+      self.assertEqual(self._airport._to_euro_rate, 1.0)
+      with contextlib.redirect_stdout(io.StringIO()):
+         self.assertRaises(SystemExit, prog.Airport, self._inputs, 'ZZZ')
+
+   def test_data_indexes(self):
+      self.assertEqual(self._inputs._aircraft_index['SIS99'], 808 * 1.60934)
+      self.assertEqual(self._inputs._currency_index['IRELAND'], 'EUR')
+      self.assertEqual(self._inputs._rate_index['GBP'], 1.4029)
+      self.assertEqual(self._inputs._resolved_airports['AMS'],
+                       prog.AirportRecord('Schiphol', 52.308613, 4.763889,
+                                          'Netherlands', 'EUR', 1.0))
 
    def test_airport_distance(self):
       self.assertEqual(self._router._calculate_distance(self._airport, self._airport2), 750.3717994608915)
 
+   def test_row_matrices(self):
+      self._router.load_row(['DUB', 'LHR', 'CDG', 'AMS', 'CPH', 'SIS99'])
+      distance = self._router._calculate_distance(self._airport2, self._airport)
+      self.assertEqual(self._router._distances[0][3], distance)
+      self.assertEqual(self._router._distances[3][0], distance)
+      self.assertEqual(self._router._leg_costs[0][3], distance * 1)
+      self.assertTrue(self._router._in_range[0][3])
+
+   def test_stream_cheapest_routes(self):
+      self._router.load_row(['BOS', 'DFW', 'ORD', 'SFO', 'ATL', '737'])
+      self._router.add_cost_add_flag()
+      expected = self._router.return_cheapest_route()
+      routes = self._router._stream_cheapest_routes(k=5)
+      self.assertEqual(len(routes), 5)
+      self.assertEqual(routes[0][1], expected[1])
+      self.assertEqual([journey[-2] for _, journey in routes],
+                       sorted(journey[-2] for journey in self._router._permutations
+                              if journey[-1] is None)[:5])
+
+   def test_held_karp_matches_permutations(self):
+      rows = [['DUB', 'LHR', 'CDG', 'AMS', 'CPH', 'SIS99'],
+              ['SNN', 'ORK', 'MAN', 'CDG', 'SIN', 'A330'],
+              ['DUB', 'LHR', 'CPH', 'HEL', 'MOS', '777'],
+              ['DUB', 'LHR', 'CDG', 'AMS', 'F50']]
+      for row in rows:
+         self._router.load_row(row)
+         self._router.add_cost_add_flag()
+         expected = self._router.return_cheapest_route()
+         actual = self._router._held_karp()
+         self.assertEqual(actual[1][-2], expected[1][-2])
+
+   def test_branch_and_bound_matches_permutations(self):
+      rows = [['DUB', 'LHR', 'CDG', 'AMS', 'CPH', 'SIS99'],
+              ['SNN', 'ORK', 'MAN', 'CDG', 'SIN', 'A330'],
+              ['BOS', 'DFW', 'ORD', 'SFO', 'ATL', '737']]
+      for row in rows:
+         self._router.load_row(row)
+         self._router.add_cost_add_flag()
+         expected = self._router.return_cheapest_route()
+         actual = self._router._branch_and_bound()
+         self.assertEqual(actual[1][-2], expected[1][-2])
+         self.assertGreater(self._router._nodes_explored, 0)
+         self.assertGreater(self._router._nodes_pruned, 0)
+
+      self._router.load_row(['SNN', 'ORK', 'MAN', 'CDG', 'SIN', 'F50'])
+      self.assertIsNone(self._router._branch_and_bound())
+
+   @unittest.skipIf(prog.np is None, "NumPy not installed")
+   def test_vectorised_matches_permutations(self):
+      router = prog.Router(self._inputs, 'vectorised', chunk_size=6)
+      for row in [['DUB', 'LHR', 'CDG', 'AMS', 'CPH', 'SIS99'],
+                  ['BOS', 'DFW', 'ORD', 'SFO', 'ATL', '737'],
+                  ['SNN', 'ORK', 'MAN', 'CDG', 'SIN', 'F50']]:
+         self._router.load_row(row)
+         router.load_row(row)
+         expected = self._router._stream_cheapest_routes()
+         actual = router.solve()
+         if not expected:
+            self.assertIsNone(actual)
+            continue
+         self.assertEqual([a._airport_code for a in actual[1][:-2]],
+                          [a._airport_code for a in expected[0][1][:-2]])
+         self.assertEqual(actual[1][-2], expected[0][1][-2])
+
+   def test_top_and_pareto_routes(self):
+      row = ['BOS', 'DFW', 'ORD', 'SFO', 'ATL', '737']
+      self._router.load_row(row)
+      expected_top = [journey[-2] for _, journey in self._router.top_routes(5)]
+      expected_front = [journey[-2] for _, journey in self._router.pareto_routes()]
+      self.assertEqual(expected_top, sorted(expected_top))
+      self.assertEqual(expected_front[0], expected_top[0])
+
+      solvers = ['branch_and_bound', 'held_karp']
+      if prog.np is not None:
+         solvers.append('vectorised')
+      for solver in solvers:
+         router = prog.Router(self._inputs, solver)
+         router.load_row(row)
+         self.assertEqual([journey[-2] for _, journey in router.top_routes(5)],
+                          expected_top)
+         self.assertEqual([journey[-2] for _, journey in router.pareto_routes()],
+                          expected_front)
+
+      distances = [self._router.route_distance(route)
+                   for route in self._router.pareto_routes()]
+      self.assertEqual(distances, sorted(distances, reverse=True))
+
+      # with no time left, the search stops at once, keeping solve's route
+      router = prog.Router(self._inputs, 'held_karp', time_budget=0)
+      router.load_row(row)
+      best_route = router.solve()
+      for routes in (router.top_routes(5, best_route), router.pareto_routes(best_route)):
+         self.assertTrue(router._search_stopped)
+         self.assertEqual([journey[-2] for _, journey in routes], [expected_top[0]])
+
+   def test_held_karp_long_row(self):
+      router = prog.Router(self._inputs, 'auto')
+      router.load_row(['DUB', 'LHR', 'CDG', 'AMS', 'CPH', 'HEL', 'ARN', 'OSL',
+                       'BRU', 'FRA', 'MAD', 'LIS', 'FCO', 'A320'])
+      home, journey = router.solve()
+      self.assertEqual(home._airport_code, 'DUB')
+      self.assertEqual(len(journey), 12 + 2)
+      self.assertEqual(len(set(journey[:-2])), 12)
+
+   def test_malformed_rows(self):
+      with contextlib.redirect_stdout(io.StringIO()):
+         self.assertRaises(SystemExit, self._router.load_row, ['DUB', '', '', 'A320'])
+         self.assertRaises(SystemExit, self._router.load_row,
+                           ['DUB', 'LHR', 'CDG', 'LHR', 'A320'])
+         self.assertRaises(SystemExit, self._router.load_row, ['DUB', 'LHR', 'DUB', 'A320'])
+      self.assertIsNone(prog._row_error(self._inputs, ['DUB', 'LHR', '', 'A320']))
+      self.assertEqual(prog._row_error(self._inputs, ['DUB', 'LHR', 'CDG', 'ZZZ']),
+                       "An Aircraft Code Was Not Found.")
+
+   def test_heuristic_matches_held_karp(self):
+      row = ['DUB', 'LHR', 'CDG', 'AMS', 'CPH', 'HEL', 'ARN', 'OSL', 'BRU',
+             'FRA', 'A320']
+      exact = prog.Router(self._inputs, 'held_karp')
+      exact.load_row(row)
+      heuristic = prog.Router(self._inputs, 'heuristic', time_budget=None,
+                              iteration_budget=50, report_gap=True)
+      heuristic.load_row(row)
+      home, journey = heuristic.solve()
+      self.assertEqual(home._airport_code, 'DUB')
+      self.assertEqual(len(set(journey[:-2])), 9)
+      self.assertEqual(journey[-2], exact.solve()[1][-2])
+      self.assertEqual(heuristic._gap, 0.0)
+
+      # no leg out of SYD is in range, so there is no round-trip to search for
+      heuristic.load_row(['VIE', 'PRG', 'BUD', 'MUC', 'ZRH', 'LNZ', 'GRZ', 'SZG',
+                          'INN', 'BRQ', 'OSR', 'LJU', 'ZAG', 'NUE', 'STR',
+                          'FRA', 'SYD', 'F50'])
+      self.assertIsNone(heuristic.solve())
+
+   def test_solve_row_output(self):
+      prog._init_worker(self._inputs, 'auto')
+      output = prog._solve_row(['DUB', 'LHR', 'CDG', 'AMS', 'CPH', 'SIS99'])
+      self.assertIn('Best route: DUB  —>  LHR  —>  CDG  —>  AMS  —>  CPH  —>  DUB', output)
+      self.assertIn('Cost:           E 2135.36', output)
+      output = prog._solve_row(['SNN', 'ORK', 'MAN', 'CDG', 'SIN', 'F50'])
+      self.assertIn('No route within range of aircraft F50.', output)
+
+   def test_compare_fleet(self):
+      airports = ['SNN', 'ORK', 'MAN', 'CDG', 'SIN']
+      routes = self._router.compare_fleet(airports, ['F50', 'A330', '777'])
+      self.assertEqual([code for code, _, _ in routes], ['F50', 'A330', '777'])
+      for code, aircraft_range, best_route in routes:
+         router = prog.Router(self._inputs, 'permutations')
+         router.load_row(airports + [code])
+         expected = router.solve()
+         if expected is None:
+            self.assertIsNone(best_route)
+            continue
+         self.assertEqual(best_route[1][-2], expected[1][-2])
+
+   def test_update_rates(self):
+      cache = prog.RouteCache()
+      router = prog.Router(self._inputs, cache=cache)
+      row = ['SNN', 'ORK', 'MAN', 'CDG', 'SIN', 'A330']
+      router.load_row(row)
+      router.solve()
+      version = self._inputs._rates_version
+      airport = prog.Airport(self._inputs, 'MAN')
+
+      changed = self._inputs.update_rates({'GBP': 0.5, 'EUR': 1.0})
+      self.assertEqual(changed, {'GBP'})
+      self.assertNotEqual(self._inputs._rates_version, version)
+      self.assertEqual(airport._to_euro_rate, 0.5)
+
+      router.update_rates(changed)
+      self.assertEqual(router._airport_dict['MAN']._to_euro_rate, 0.5)
+      leg_costs = [list(costs) for costs in router._leg_costs]
+      router._build_matrices()
+      self.assertEqual(router._leg_costs, leg_costs)
+
+      expected = prog.Router(self._inputs, 'permutations')
+      expected.load_row(row)
+      router.load_row(row)
+      self.assertEqual(router.solve()[1][-2], expected.solve()[1][-2])
+      self.assertIsNot(cache.previous(prog.RouteCache.key('SNN', row[1:-1],
+                       router._aircraft._range, self._inputs._rates_version)),
+                       prog.RouteCache._missing)
+
+   def test_split_routes(self):
+      airports = ['DUB', 'LHR', 'CDG', 'AMS', 'CPH', 'JFK', 'BOS']
+      total, routes = self._router.split_routes(airports, ['F50', '777'])
+      self.assertEqual([code for code, _ in routes], ['F50', '777'])
+      flown = [code for _, route in routes if route is not None
+               for code in route[0][1:-1]]
+      self.assertEqual(sorted(flown), sorted(airports[1:]))
+      self.assertEqual(total, round(sum(route[1] for _, route in routes
+                                        if route is not None), 2))
+
+      # every aircraft flies by default; left free to idle, the split is no
+      # dearer, nor dearer than the 777 alone, which can fly the lot
+      self.assertTrue(all(route is not None for _, route in routes))
+      idle_total, _ = self._router.split_routes(airports, ['F50', '777'],
+                                                every_aircraft=False)
+      self.assertLessEqual(idle_total, total)
+      alone = prog.Router(self._inputs, 'permutations')
+      alone.load_row(airports + ['777'])
+      self.assertLessEqual(idle_total, alone.solve()[1][-2])
+      self.assertIsNone(self._router.split_routes(airports, ['F50', 'F50']))
+
+      _, routes = self._router.split_routes(airports, ['F50', '777'],
+                                            max_stops=3)
+      self.assertTrue(all(len(route[0]) - 2 <= 3 for _, route in routes))
+      self.assertIsNone(self._router.split_routes(airports, ['F50', '777'],
+                                                  max_stops=2))
+      self.assertIsNone(self._router.split_routes(['DUB', 'LHR'],
+                                                  ['F50', '777']))
+
+      # the cheapest of every split in which both aircraft fly
+      small = ['DUB', 'LHR', 'CDG', 'AMS']
+      total, _ = self._router.split_routes(small, ['F50', '777'])
+      cheapest = float('inf')
+      for mask in range(1, 7):
+         cost = 0
+         for aircraft, bit in [('F50', 0), ('777', 1)]:
+            row = [code for i, code in enumerate(small[1:])
+                   if (mask >> i & 1) == bit]
+            alone.load_row(['DUB'] + row + [aircraft])
+            best_route = alone.solve()
+            cost = float('inf') if best_route is None else cost + best_route[1][-2]
+         cheapest = min(cheapest, cost)
+      self.assertAlmostEqual(total, cheapest, places=2)
+
+   def test_profile_counters(self):
+      profile = prog.Profile()
+      router = prog.Router(self._inputs, 'permutations', cache=prog.RouteCache(),
+                           profile=profile)
+      for row in [['SNN', 'ORK', 'MAN', 'CDG', 'SIN', 'F50'],
+                  ['SNN', 'ORK', 'MAN', 'CDG', 'SIN', 'F50']]:
+         router.load_row(row)
+         router.solve()
+      report = profile.as_dict()
+      self.assertEqual(report['counters']['airports_resolved'], 5)
+      self.assertEqual(report['counters']['airport_cache_hits'], 5)
+      self.assertEqual(report['counters']['aircraft_cache_hits'], 1)
+      self.assertEqual(report['counters']['route_cache_hits'], 1)
+      self.assertEqual(report['counters']['permutations_evaluated'], 24)
+      self.assertEqual(report['counters']['permutations_out_of_range'], 24)
+      self.assertEqual(report['timers']['solve']['calls'], 2)
+
+      # JSON Lines rows solved in a pool are profiled as in a single process
+      profile = prog.Profile()
+      line = '{"home": "SNN", "destinations": ["ORK", "MAN", "CDG", "SIN"], "aircraft": "F50"}'
+      with contextlib.redirect_stdout(io.StringIO()):
+         prog._stream_records([line] * 4, 2, (self._inputs, 'permutations', None,
+                                              False, 1.0, None, True), profile=profile)
+      report = profile.as_dict()
+      self.assertEqual(report['counters']['rows'], 4)
+      self.assertEqual(report['timers']['row']['calls'], 4)
+
+   def test_data_dir(self):
+      data = prog.Data(use_snapshot=False,
+                       data_dir=os.path.dirname(os.path.abspath(prog.__file__)))
+      data.populate_dicts()
+      self.assertEqual(os.path.basename(data._input_test), 'test.csv')
+      self.assertEqual(data._resolved_airports['DUB'],
+                       self._inputs._resolved_airports['DUB'])
+
+      # the server needs only the 4 reference csv files, not test.csv
+      with tempfile.TemporaryDirectory() as directory:
+         for path in self._inputs._input_csvs:
+            with open(path, 'rb') as source, \
+                 open(os.path.join(directory, os.path.basename(path)), 'wb') as copy:
+               copy.write(source.read())
+         # other csv files are ignored, however they sort among the inputs
+         with open(os.path.join(directory, 'airline.csv'), 'w') as other:
+            other.write('code,name\nEI,Aer Lingus\n')
+         data = prog.Data(data_dir=directory)
+         data.populate_dicts()
+         self.assertEqual(data._input_test, '')
+         self.assertEqual(data._resolved_airports['DUB'],
+                          self._inputs._resolved_airports['DUB'])
+         self.assertEqual(os.path.dirname(data._snapshot_path), directory)
+
+   def test_server_answer(self):
+      prog._init_worker(self._inputs, 'auto')
+      request = {'id': 7, 'home': 'DUB', 'destinations': ['LHR', 'CDG', 'AMS', 'CPH'],
+                 'aircraft': 'SIS99'}
+      with concurrent.futures.ThreadPoolExecutor(1) as executor:
+         reply = asyncio.run(server.answer(self._inputs, executor,
+                                           json.dumps(request).encode()))
+         self.assertEqual(reply['id'], 7)
+         self.assertEqual(reply['order'], ['LHR', 'CDG', 'AMS', 'CPH'])
+         self.assertEqual(reply['route'], ['DUB', 'LHR', 'CDG', 'AMS', 'CPH', 'DUB'])
+         self.assertEqual(reply['cost'], 2135.36)
+         request['aircraft'] = 'XXX'
+         reply = asyncio.run(server.answer(self._inputs, executor,
+                                           json.dumps(request).encode()))
+         self.assertEqual(reply, {'id': 7, 'error': 'unknown aircraft XXX'})
+         for destinations in (['LHR', 'CDG', 'LHR'], ['LHR', 'DUB']):
+            request.update(aircraft='A320', destinations=destinations)
+            reply = asyncio.run(server.answer(self._inputs, executor,
+                                              json.dumps(request).encode()))
+            self.assertIn('named more than once', reply['error'])
+
+   def test_solve_records(self):
+      prog._init_worker(self._inputs, 'auto')
+      result = json.loads(prog._solve_record(
+         '{"id": "a", "home": "DUB", "destinations": ["LHR", "CDG", "AMS", "CPH"], '
+         '"aircraft": "SIS99"}'))
+      self.assertEqual(result['id'], 'a')
+      self.assertEqual(result['order'], ['LHR', 'CDG', 'AMS', 'CPH'])
+      self.assertEqual(result['cost'], 2135.36)
+      self.assertGreater(result['distance'], 0)
+
+      result = json.loads(prog._solve_record('["SNN", "ORK", "MAN", "CDG", "SIN", "F50"]'))
+      self.assertEqual(result['error'], 'no route within range of aircraft F50')
+      result = json.loads(prog._solve_record('["DUB", "A320"]'))
+      self.assertIn('error', result)
+      self.assertNotIn('cost', result)
+
+   def test_snapshot_round_trip(self):
+      data = prog.Data(use_snapshot=False)
+      data.populate_dicts()
+      sources = data._snapshot_sources()
+
+      with tempfile.TemporaryDirectory() as directory:
+         path = os.path.join(directory, 'airports.snapshot')
+         prog.Snapshot.write(path, data._resolved_airports, sources)
+         snapshot = prog.Snapshot.load(path, sources)
+
+         self.assertEqual(len(snapshot), len(data._resolved_airports))
+         self.assertEqual(snapshot['AMS'], data._resolved_airports['AMS'])
+         self.assertNotIn('XXX', snapshot)
+         self.assertIsNone(prog.Snapshot.load(path, sources[:2] + [path]))
+         del snapshot
+
+   def test_distance_store(self):
+      with tempfile.TemporaryDirectory() as directory:
+         source = os.path.join(directory, 'airport.csv')
+         with open(self._inputs._input_csvs[1]) as full, open(source, 'w') as part:
+            part.writelines(line for i, line in enumerate(full) if i < 400 or
+                            line.split(',')[4].strip('"') in ('DUB', 'JFK', 'SIN'))
+         path = os.path.join(directory, 'airports.distances')
+         prog.DistanceStore.write(path, source)
+         store = prog.DistanceStore.load(path, source)
+
+         for code1, code2 in [('DUB', 'JFK'), ('SIN', 'DUB'), ('JFK', 'SIN')]:
+            record1 = self._inputs._resolved_airports[code1]
+            record2 = self._inputs._resolved_airports[code2]
+            self.assertAlmostEqual(store.distance(code1, code2),
+                                   prog._great_circle_distance(
+                                      record1._latitude, record1._longitude,
+                                      record2._latitude, record2._longitude),
+                                   places=2)
+         self.assertEqual(store.distance('JFK', 'DUB'), store.distance('DUB', 'JFK'))
+         self.assertIsNone(store.distance('DUB', 'XXX'))
+         self.assertEqual(store.matrix(['DUB', 'JFK', 'DUB'])[0],
+                          [0.0, store.distance('DUB', 'JFK'), 0.0])
+         self.assertIsNone(store.matrix(['DUB', 'XXX']))
+
+         data = prog.Data()
+         data.populate_dicts()
+         data._distance_store = store
+         router = prog.Router(data)
+         row = ['DUB', 'JFK', 'SIN', '777']
+         router.load_row(row)
+         self._router.load_row(row)
+         self.assertEqual(router._distances[0][1], store.distance('DUB', 'JFK'))
+         self.assertEqual(router.route_codes(router.solve()),
+                          self._router.route_codes(self._router.solve()))
+
+         with open(source, 'a') as part:
+            part.write('\n')
+         self.assertIsNone(prog.DistanceStore.load(path, source))
+         del store
+
+   def test_route_cache(self):
+      with tempfile.TemporaryDirectory() as directory:
+         path = os.path.join(directory, 'routes.json')
+         cache = prog.RouteCache(capacity=2, path=path)
+         router = prog.Router(self._inputs, cache=cache)
+
+         row = ['DUB', 'LHR', 'CDG', 'AMS', 'CPH', 'SIS99']
+         router.load_row(row)
+         first = router.solve()
+         router.load_row(['DUB', 'CPH', 'AMS', 'CDG', 'LHR', 'SIS99'])
+         second = router.solve()
+         self.assertEqual((cache._hits, cache._misses), (1, 1))
+         self.assertEqual(second[1], first[1])
+
+         router.load_row(['SNN', 'ORK', 'MAN', 'CDG', 'SIN', 'F50'])
+         self.assertIsNone(router.solve())
+         router.load_row(['BOS', 'DFW', 'ORD', 'SFO', 'ATL', '737'])
+         router.solve()
+         self.assertEqual(len(cache._routes), 2)
+         cache.save()
+
+         reloaded = prog.RouteCache(capacity=2, path=path)
+         key = prog.RouteCache.key('SNN', ['ORK', 'MAN', 'CDG', 'SIN'],
+                                   self._inputs._aircraft_index['F50'],
+                                   self._inputs._rates_version)
+         self.assertIsNone(reloaded.get(key))
+         self.assertEqual(reloaded._hits, 1)
+         stale = prog.RouteCache.key(*key[:3], 'changed rates')
+         self.assertIs(reloaded.get(stale), prog.RouteCache._missing)
+         self.assertEqual(len(reloaded._routes), 0)
+
+      # heuristic routes are never served to an exact solver, nor vice versa
+      shared = prog.RouteCache()
+      heuristic = prog.Router(self._inputs, 'heuristic', cache=shared,
+                              time_budget=None, iteration_budget=1)
+      exact = prog.Router(self._inputs, 'held_karp', cache=shared)
+      for router in (heuristic, exact):
+         router.load_row(row)
+         router.solve()
+      self.assertEqual((shared._hits, len(shared._routes)), (0, 2))
+
+   def test_spatial_index_matches_brute_force(self):
+      index = self._inputs.spatial_index()
+      coordinates = prog.Data._read_coordinates(self._inputs._input_csvs[1])
+      for latitude, longitude in [(53.4, -6.2), (-33.9, 151.2), (89.0, 179.0)]:
+         distances = sorted((prog._great_circle_distance(latitude, longitude,
+                                                         *position), code)
+                            for code, position in coordinates.items())
+         self.assertEqual(index.nearest(latitude, longitude, 10), distances[:10])
+         self.assertEqual(index.within(latitude, longitude, 1300.0),
+                          [pair for pair in distances if pair[0] <= 1300.0])
+
+      reachable = self._inputs.reachable_airports('DUB', self._aircraft._range)
+      self.assertIn('AMS', [code for _, code in reachable])
+      self.assertNotIn('DUB', [code for _, code in reachable])
+      # airports without a known rate are still found, e.g. Kaliningrad
+      self.assertNotIn('KGD', self._inputs._resolved_airports)
+      self.assertIn('KGD', [code for _, code in reachable])
+
+   def test_refuelling_stops(self):
+      row = ['SNN', 'BOS', 'SIS99']
+      self._router.load_row(row)
+      self.assertIsNone(self._router.solve())
+
+      router = prog.Router(self._inputs, refuel=True)
+      router.load_row(row)
+      best_route = router.solve()
+      codes = [code.strip('()') for code in router.route_codes(best_route)]
+      self.assertEqual((codes[0], codes[-1]), ('SNN', 'SNN'))
+      self.assertIn('BOS', codes)
+
+      cost = 0
+      records = self._inputs._resolved_airports
+      for code1, code2 in zip(codes, codes[1:]):
+         airport1 = prog.Airport(self._inputs, code1)
+         airport2 = prog.Airport(self._inputs, code2)
+         distance = router._calculate_distance(airport1, airport2)
+         self.assertLessEqual(distance, router._aircraft._range)
+         cost += distance * airport1._to_euro_rate
+      self.assertAlmostEqual(best_route[1][-2], cost, places=1)
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)